@@ -3,23 +3,38 @@
 # The main program of Tetris 2048 Base Code                                    #
 #                                                                              #
 ################################################################################
-import math
-
 import lib.stddraw as stddraw  # for creating an animation with user interactions
 from lib.picture import Picture  # used for displaying an image on the game menu
 from lib.color import Color  # used for coloring the game menu
 import os  # the os module is used for file and directory operations
+from engine import Game, History  # the headless game engine (game rules)
 from game_grid import GameGrid  # the class for modeling the game grid
 from tetromino import Tetromino  # the class for modeling the tetrominoes
-import random  # used for creating tetrominoes with random types (shapes)
-import time
+from replay import Recorder  # used for recording the games to replay them
+from bot import AutoPlayer  # used for playing the game automatically
+from scheduler import Scheduler  # used for running the game loop
+from controls import KeyRepeater  # used for reading the keys typed and held
+import argparse  # used for parsing the command line arguments
 import sys
 
-from tile import tile_colors
-
-
-# The main function where this program starts execution
-def start():
+# the intervals in milliseconds at which the tetromino moves down on each
+# difficulty level (chosen on the game menu and stored as grid.speed)
+gravity_intervals = {"easy": 450, "normal": 250, "hard": 125}
+# the number of frames rendered per second and the number of times per second
+# the keys typed are checked (independent of the gravity interval)
+frame_rate, input_rate = 60, 200
+# the default delay (DAS) and interval (ARR) in milliseconds of repeating the
+# movement keys held down
+default_das, default_arr = 170, 50
+
+
+# The main function where this program starts execution (the game is created
+# with the given seed, and it is recorded to the given replay file if any). In
+# the autoplay mode, the tetrominoes are moved by a bot instead of the player.
+# The movement keys held down are repeated after das milliseconds and then
+# every arr milliseconds.
+def start(seed=None, record_file=None, autoplay=False, das=default_das,
+          arr=default_arr):
     # set the dimensions of the game grid
     grid_h, grid_w = 20, 12
     # set the size of the drawing canvas (the displayed window)
@@ -29,24 +44,21 @@ def start():
     stddraw.setXscale(-1, grid_w + 5)
     stddraw.setYscale(-1, grid_h)
 
-    # set the game grid dimension values stored and used in the Tetromino class
-    Tetromino.grid_height = grid_h
-    Tetromino.grid_width = grid_w
     # create the game grid
     grid = GameGrid(grid_h, grid_w)
-    # create the first tetromino to enter the game grid
-    # by using the create_tetromino function defined below
-    current_tetromino = create_tetromino()
-    next_tetromino = create_tetromino()
-    
-    # Assign the current and next tetrominoes to the grid
-    grid.current_tetromino = current_tetromino
-    grid.set_next_tetromino(next_tetromino)
+    # create the game on this grid; the game engine creates the current and
+    # the next tetrominoes and assigns them to the grid
+    game = Game(grid=grid, piece_class=Tetromino, seed=seed)
+    recorder = Recorder(game) if record_file is not None else None
+    # keep the undo history of the placements (undo with Z and redo with Y)
+    game.history = History()
+    # record the effects of settling the grid after each placement, so that
+    # the game grid animates them while the game goes on
+    grid.effects = []
+    autoplayer = AutoPlayer()
 
-    grid.current_tetromino = current_tetromino
-    GameGrid.score = grid.score
- 
-    print("Next tetromino type is: " + next_tetromino.type)
+    print("Seed: " + str(game.seed))
+    print("Next tetromino type is: " + game.next_tetromino.type)
 
 
     # display a simple menu before opening the game
@@ -54,68 +66,59 @@ def start():
     display_game_menu(grid, grid_h, grid_w)
     
     paused = False  # Variable to track whether the game is paused or not
-
-    while True:
+    # the game loop runs the input polling, the gravity and the rendering at
+    # their own rates on a monotonic clock
+    scheduler = Scheduler()
+    key_repeater = KeyRepeater(das, arr)
+
+    # A function for checking the keys typed and applying all of them (and the
+    # repeats of the held movement keys) to the game in order
+    def poll_input():
+        nonlocal paused, autoplay
+        stddraw.pollEvents()
         # Check for user interaction via the keyboard
-        if stddraw.hasNextKeyTyped():  
-            key_typed = stddraw.nextKeyTyped()  
+        for key_typed in key_repeater.get_keys():
             if key_typed == "p":
                 paused = not paused  # Toggle paused state
+                # the tetromino does not move down while the game is paused
+                scheduler.set_active(gravity, not paused)
+            elif key_typed == "a":
+                autoplay = not autoplay  # Toggle the autoplay mode
+            elif key_typed == "z":
+                game.undo()  # step back to before the last placement
+                grid.stop_animations()
+            elif key_typed == "y":
+                game.redo()
+                grid.stop_animations()
             elif not paused:  # Process key inputs only if the game is not paused
-                if key_typed == "left":
-                    current_tetromino.move(key_typed, grid)
-                elif key_typed == "right":
-                    current_tetromino.move(key_typed, grid)
-                elif key_typed == "down":
-                    current_tetromino.move(key_typed, grid)
-                elif key_typed == "up":
-                    current_tetromino.rotate(grid)
-                elif key_typed == "space":
-                    while current_tetromino.move("down", grid):  # Move down until cannot move anymore
-                        pass
-                stddraw.clearKeysTyped()
-
-        if not paused:
-            success = current_tetromino.move("down", grid)
-
-            if not success:
-                tiles, pos = current_tetromino.get_min_bounded_tile_matrix(True)
-                game_over = grid.update_grid(tiles, pos)
-
-                if game_over:
-                    display_game_over_menu(grid, grid.score)
-                    return  # Exit the game loop
-
-                merge = check_merging(grid)
-                while merge:
-                    merge = check_merging(grid)
-
-                delete_free_tiles(grid)
-                clear_full_rows(grid)
-
-                current_tetromino = next_tetromino
-                next_tetromino = create_tetromino()
-                grid.current_tetromino = current_tetromino
-                grid.set_next_tetromino(next_tetromino)
-
-            grid.display()
-
-        # Add a small delay to avoid excessive CPU usage
-        stddraw.show(50)
+                game.apply_action(key_typed)
+
+    # A function for moving the current tetromino down (or locking it and
+    # settling the grid) once per gravity interval
+    def apply_gravity():
+        # the bot rotates and moves each new tetromino to the placement it
+        # chooses and then drops it (with the same actions as the keys)
+        if autoplay:
+            for action in autoplayer.get_actions(game):
+                game.apply_action(action)
+        game.step()
+        if game.game_over:
+            scheduler.stop()  # Exit the game loop
+
+    scheduler.add(1000 / input_rate, poll_input)
+    # a late gravity tick is made up for (up to 3 ticks at once), so the game
+    # speed does not depend on how long the frames take
+    gravity = scheduler.add(grid.speed, apply_gravity, max_steps=3)
+    # the game grid only redraws the regions that changed since the last frame
+    scheduler.add(1000 / frame_rate, grid.display)
+    scheduler.run()
+
+    if recorder is not None:
+        recorder.save(record_file, game.ticks)
+    display_game_over_menu(grid, grid.score)
 print("Game over")
 
 
-# A function for creating random shaped tetrominoes to enter the game grid
-def create_tetromino():
-    # the type (shape) of the tetromino is determined randomly
-    tetromino_types = ['I', 'O', 'Z', 'J', 'L', 'T', 'S']
-    random_index = random.randint(0, len(tetromino_types) - 1)
-    random_type = tetromino_types[random_index]
-    # create and return the tetromino
-    tetromino = Tetromino(random_type)
-    return tetromino
-
-
 # A function for displaying a simple menu before starting the game
 def display_game_menu(grid, grid_height, grid_width):
     # the colors used for the menu
@@ -207,7 +210,7 @@ def display_game_menu(grid, grid_height, grid_width):
     stddraw.setPenColor(text_color)
     stddraw.text(hard_button_x + button_w / 4, button_text_y - 4, "Hard")
 
-    grid.speed = 200 #default value
+    grid.speed = gravity_intervals["normal"] #default value
 
     while True:
         # display the menu and wait for a short time (50 ms)
@@ -221,21 +224,21 @@ def display_game_menu(grid, grid_height, grid_width):
                     button_blc_y - 4 <= mouse_y <= button_blc_y - 4 + button_h:
 
                 # grid.speed'i değiştir
-                grid.speed = 400 #450
+                grid.speed = gravity_intervals["easy"]
                 print(grid.speed)  # Örnek olarak 1000 olarak ayarladım, siz istediğiniz değeri verebilirsiniz
                 pass
 
             elif normal_button_x <= mouse_x <= normal_button_x + button_w / 2 and \
                     button_blc_y - 4 <= mouse_y <= button_blc_y - 4 + button_h:
                 # Normal butonun event handler'i buraya yazılabilir
-                grid.speed = 200 #250
+                grid.speed = gravity_intervals["normal"]
                 print(grid.speed)  # Örnek olarak 1000 olarak ayarladım, siz istediğiniz değeri verebilirsiniz
                 pass
 
             elif hard_button_x <= mouse_x <= hard_button_x + button_w / 2 and \
                     button_blc_y - 4 <= mouse_y <= button_blc_y - 4 + button_h:
                 # Hard butonun event handler'i buraya yazılabilir
-                grid.speed = 75 #125
+                grid.speed = gravity_intervals["hard"]
                 print(grid.speed)  # Örnek olarak 1000 olarak ayarladım, siz istediğiniz değeri verebilirsiniz
                 pass
 
@@ -250,12 +253,7 @@ def display_game_menu(grid, grid_height, grid_width):
 
 def display_game_over_menu(grid,score):
     # Check if the grid contains a tile with the value 2048 or more
-    win_condition = False
-    for row in range(grid.grid_height):
-        for col in range(grid.grid_width):
-            if grid.tile_matrix[row][col] is not None and (grid.tile_matrix[row][col].number >= 2048):
-                win_condition = True
-                break
+    win_condition = grid.max_tile() >= 2048
 
     # Clear the screen with the same background color as the menu
     background_color = Color(42, 69, 99)
@@ -305,138 +303,45 @@ def display_game_over_menu(grid,score):
         # Add a small delay to avoid excessive CPU usage
         stddraw.show(50)
 
-def check_merging(grid):
-    merged = False
-    for a in range(1, 19):
-        for b in range(12):
-            if grid.tile_matrix[a][b] is not None and grid.tile_matrix[a - 1][b] is not None and grid.tile_matrix[a][b].number == grid.tile_matrix[a - 1][b].number:
-                merged_number = grid.tile_matrix[a][b].number + grid.tile_matrix[a - 1][b].number
-                merged_value = grid.tile_matrix[a][b].number * 2  # Calculate the merged value
-                grid.tile_matrix[a - 1][b].number = merged_value
-                grid.score += grid.tile_matrix[a][b].number * 2  # Calculate the merged value
-
-                # If the merged number is greater than 4096, use the color for 4096
-                if merged_number >= 4096:
-                    tile_color_index = int(math.log(4096, 2)) - 1
-                else:
-                    tile_color_index = int(math.log(merged_number, 2)) - 1
-
-                grid.tile_matrix[a - 1][b].background_color = tile_colors[tile_color_index]
-
-                # grid.score += grid.tile_matrix[a][b].number
-                row = a
-                while row < 18:
-                    grid.tile_matrix[row][b] = grid.tile_matrix[row + 1][b]
-                    if grid.tile_matrix[row + 1][b] is not None:
-                        grid.tile_matrix[row + 1][b].set_position((row, b))
-                    row += 1
-                grid.tile_matrix[18][b] = None
-                merged = True
-
-
-                grid.display()
-
-                return merged
-    return merged
-
-
-# Function to detect and return a list of coordinates of free tiles in the grid
-def detect_free_tiles(grid):
-    free_tiles = []
-    visited = [[False for _ in range(grid.grid_width)] for _ in range(grid.grid_height)]
-
-    # Mark tiles of the current tetromino as connected
-    if grid.current_tetromino is not None:
-        for tile in grid.current_tetromino.tiles:
-            row, col = tile.position.y, tile.position.x
-            visited[row][col] = True
-
-    # Mark tiles connected to the bottom as visited
-    for col in range(grid.grid_width):
-        if grid.tile_matrix[0][col] is not None:
-            is_connected_to_bottom(grid, 0, col, visited)
-
-    # Iterate over grid to detect free tiles
-    for row in range(grid.grid_height):
-        for col in range(grid.grid_width):
-            if grid.tile_matrix[row][col] is not None and not visited[row][col]:
-                free_tiles.append((row, col))
-
-    return free_tiles
-
-
-# Helper function to check if there is a path to the bottom
-def is_connected_to_bottom(grid, row, col, visited):
-    # Create a stack for DFS
-    stack = [(row, col)]
-
-    while stack:
-        row, col = stack.pop()
-        if not visited[row][col]:
-            visited[row][col] = True
-
-            # Check all four directions (up, down, left, right)
-            for dr, dc in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
-                new_row, new_col = row + dr, col + dc
-                if (0 <= new_row < grid.grid_height and 0 <= new_col < grid.grid_width and
-                        grid.tile_matrix[new_row][new_col] is not None and not visited[new_row][new_col]):
-                    stack.append((new_row, new_col))
-
-
-# Function to delete free tiles from the grid
-def delete_free_tiles(grid):
-    free_tiles = detect_free_tiles(grid)
-    for row, col in free_tiles:
-        if grid.tile_matrix[row][col] is not None:
-            grid.score += grid.tile_matrix[row][col].number  # Add the tile value to the total before deleting the tile
-            grid.tile_matrix[row][col] = None
-
-
-    grid.display()
-
-def clear_full_rows(grid):
-    # Create an empty row to be reused
-    empty_row = [None] * grid.grid_width
-    rows_to_clear = []
-
-    # Identify full rows
-    for i in range(grid.grid_height):
-        is_full = True
-        for j in range(grid.grid_width):
-            if grid.tile_matrix[i][j] is None:
-                is_full = False
-                break
-        if is_full:
-            rows_to_clear.append(i)
-
-    # Clear and shift rows
-    if rows_to_clear:
-        num_rows_cleared = len(rows_to_clear)
-        for row in reversed(rows_to_clear):
-            row_sum = 0  # To store the sum of tile values in the cleared row
-            for j in range(grid.grid_width):
-                if grid.tile_matrix[row][j] is not None:
-                    grid.score += grid.tile_matrix[row][j].number
-
-
-            # Shift all rows above the cleared row down
-            for next_row in range(row, grid.grid_height - num_rows_cleared):
-                for col in range(grid.grid_width):
-                    grid.tile_matrix[next_row][col] = grid.tile_matrix[next_row + 1][col]
-
-            # Set the topmost row to the empty row
-            for col in range(grid.grid_width):
-                grid.tile_matrix[grid.grid_height - num_rows_cleared][col] = None
-
-            num_rows_cleared -= 1
-
 def restart():
     python = sys.executable
     os.execl(python, python, *sys.argv)
     stdDraw.setVisible(True)
 
 
+# A function for parsing the DAS delay given on the command line (a delay of
+# 0 repeats a held key at once)
+def das_delay(text):
+    delay = int(text)
+    if delay < 0:
+        raise argparse.ArgumentTypeError("must be 0 or more ms")
+    return delay
+
+
+# A function for parsing the ARR interval given on the command line (a held
+# key is repeated at most once per interval, so the interval must be positive)
+def arr_interval(text):
+    interval = int(text)
+    if interval <= 0:
+        raise argparse.ArgumentTypeError("must be 1 or more ms")
+    return interval
+
+
 # start() function is specified as the entry point (main function) from which
 # the program starts execution
 if __name__ == '__main__':
-    start()
+    parser = argparse.ArgumentParser(description="Tetris 2048")
+    parser.add_argument("--seed", type=int, default=None,
+                        help="the seed of the game (random by default)")
+    parser.add_argument("--record", metavar="FILE", default=None,
+                        help="record the game to a replay file")
+    parser.add_argument("--autoplay", action="store_true",
+                        help="let the bot play the game")
+    parser.add_argument("--das", type=das_delay, default=default_das,
+                        help="the delay in ms before a held key repeats "
+                             "(default: %d)" % default_das)
+    parser.add_argument("--arr", type=arr_interval, default=default_arr,
+                        help="the interval in ms of the repeats of a held key "
+                             "(default: %d)" % default_arr)
+    args = parser.parse_args()
+    start(args.seed, args.record, args.autoplay, args.das, args.arr)
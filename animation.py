@@ -0,0 +1,55 @@
+################################################################################
+#                                                                              #
+# A timeline for animating the effects of settling the game grid               #
+#                                                                              #
+# The game engine settles the grid at once after a tetromino is locked, and    #
+# it can record each step (the merges, the deletion of the free tiles and the  #
+# clearing of the full rows) as an effect (see engine.settle). The timeline    #
+# plays these effects one after another for fixed durations on a monotonic     #
+# clock. It never waits: the renderer asks which effect to draw and how far    #
+# it has progressed, so the game loop keeps polling the input meanwhile.       #
+#                                                                              #
+################################################################################
+import time
+from collections import deque
+
+# the durations in milliseconds of the animations of the effects by kind
+durations = {"merge": 120, "free": 150, "clear": 180}
+
+
+# A class for playing the effects of settling the game grid one after another
+class Timeline:
+   # A constructor for creating an empty timeline on the given clock
+   def __init__(self, clock=time.monotonic):
+      self.clock = clock
+      # the effects to play and the time at which the first one started
+      self.effects = deque()
+      self.start_time = None
+
+   # A method for adding the given effects (of settling the grid after a
+   # tetromino is locked) to the timeline. The effects of a previous lock that
+   # are still playing are skipped, so the visuals never lag behind the game.
+   def add(self, effects):
+      self.effects.clear()
+      self.effects.extend(effects)
+      self.start_time = self.clock()
+
+   # A method for removing all the effects (e.g., when the grid is changed
+   # without settling it, as in undoing a placement)
+   def clear(self):
+      self.effects.clear()
+      self.start_time = None
+
+   # A method that returns the effect to draw now and its progress from 0 to 1,
+   # or None when all the effects are finished
+   def get_current(self):
+      now = self.clock()
+      while self.effects:
+         duration = durations[self.effects[0][0]] / 1000
+         progress = (now - self.start_time) / duration
+         if progress < 1:
+            return self.effects[0], progress
+         # the next effect starts when this one ends
+         self.effects.popleft()
+         self.start_time += duration
+      return None
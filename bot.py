@@ -0,0 +1,328 @@
+################################################################################
+#                                                                              #
+# A bot that plays Tetris 2048 by searching the placements of the tetrominoes  #
+#                                                                              #
+# For each new tetromino, every rotation and column that it can reach from     #
+# its entry position is tried on a copy of the headless board (locking the     #
+# tiles, merging them, deleting the free tiles and clearing the full rows as   #
+# the game does) and the resulting boards are scored by a heuristic that knows #
+# about the merges of 2048. The chosen placement is then played by rotating    #
+# and moving the tetromino with the same actions as the keyboard.              #
+#                                                                              #
+################################################################################
+import argparse  # used for parsing the command line arguments
+import itertools  # used for enumerating the exponents of the tiles
+import time
+from collections import OrderedDict  # used for the LRU memo of the search
+
+import numpy as np  # fundamental Python module for scientific computing
+
+# the headless game engine (the game rules applied after locking a tetromino)
+from engine import Game, rotation_states, settle, tetromino_types, tile_exponents
+
+# the weights of the heuristic terms (see evaluate)
+weights = {
+   "score": 1.0,  # the points earned by the placement (merges, cleared rows)
+   "pairs": 6.0,  # horizontally adjacent tiles with the same number
+   "stacked": -4.0,  # tiles stacked on a smaller tile (blocking its merges)
+   "holes": -60.0,  # empty cells below the top tile of their column
+   "height": -3.0,  # the sum of the column heights
+   "max_height": -12.0,  # the height of the highest column
+   "bumpiness": -8.0,  # the differences of the heights of adjacent columns
+}
+
+
+# A function that returns the heuristic value of a board (greater is better)
+def evaluate(board):
+   if board.game_over:
+      return float("-inf")
+   tiles = board.tile_matrix
+   heights = board.column_heights
+   # the empty cells below the skyline are the holes
+   holes = sum(heights) - int(np.count_nonzero(tiles))
+   bumpiness = sum(abs(heights[col] - heights[col + 1])
+                   for col in range(len(heights) - 1))
+   left, right = tiles[:, :-1], tiles[:, 1:]
+   pairs = int(((left == right) & (left != 0)).sum())
+   lower, upper = tiles[:-1], tiles[1:]
+   stacked = int(((upper > lower) & (lower != 0)).sum())
+   return (weights["score"] * board.score + weights["pairs"] * pairs
+           + weights["stacked"] * stacked + weights["holes"] * holes
+           + weights["height"] * sum(heights)
+           + weights["max_height"] * max(heights)
+           + weights["bumpiness"] * bumpiness)
+
+
+# A function that returns the placements that the given tetromino can reach
+# on the given board by rotating it at its position and then moving it left or
+# right, as (rotation, number of rotations, column) tuples. Only the distinct
+# rotation states are tried (e.g., a single one for the O tetromino).
+def get_placements(board, piece):
+   x, y = piece.bottom_left_cell.x, piece.bottom_left_cell.y
+   placements, seen = [], set()
+   for n_rotations in range(4):
+      rotation = (piece.rotation + n_rotations) % 4
+      state = piece.states[rotation]
+      # the tetromino is rotated at its position, so it stops at a collision
+      if not board.can_be_placed(state, x, y):
+         break
+      # the rotation states with the same tiles give the same placements
+      key = tuple(sorted(state.offsets))
+      if key in seen:
+         continue
+      seen.add(key)
+      placements.append((rotation, n_rotations, x))
+      for step in (-1, 1):
+         col = x + step
+         while board.can_be_placed(state, col, y):
+            placements.append((rotation, n_rotations, col))
+            col += step
+   return placements
+
+
+# A function that returns the board after a tetromino in the given rotation
+# state with the given tile exponents is dropped and locked on a copy of the
+# given board in the given column (the row of the bottom left cell is found
+# from the skyline of the board, and it is negative when the bottom rows of
+# the tile matrix of the rotation state are empty, as in Piece.get_drop_row)
+def place(board, state, exponents, x):
+   y = board.get_landing_row(state, x)
+   result = board.copy()
+   tiles = [(y + dy, x + dx, exponent)
+            for (dx, dy), exponent in zip(state.offsets, exponents)]
+   if not result.lock_tiles(tiles):
+      settle(result)
+   return result
+
+
+# A function that returns the best placement of the given tetromino on the
+# given board as (value, rotation, number of rotations, column), or None when
+# the tetromino cannot be placed
+def search(board, piece):
+   best = None
+   for rotation, n_rotations, x in get_placements(board, piece):
+      value = evaluate(place(board, piece.states[rotation], piece.exponents, x))
+      if best is None or value > best[0]:
+         best = (value, rotation, n_rotations, x)
+   return best
+
+
+# A function that returns the placements of a tetromino of the given type
+# that enters the given board at an unknown column, as (rotation state, column)
+# pairs for the distinct rotation states and all the columns where it can be
+# placed at the entry row (used for the tetrominoes that are not created yet)
+def get_entry_placements(board, shape):
+   placements, seen = [], set()
+   y = board.grid_height - 1
+   for state in rotation_states[shape]:
+      key = tuple(sorted(state.offsets))
+      if key in seen:
+         continue
+      seen.add(key)
+      for x in range(-state.min_col, board.grid_width - state.max_col):
+         if board.can_be_placed(state, x, y):
+            placements.append((state, x))
+   return placements
+
+
+# the tile exponents of a tetromino that is not created yet: each of its 4
+# tiles gets one of tile_exponents with the same probability (as in Piece)
+exponent_outcomes = list(itertools.product(tile_exponents, repeat=4))
+
+
+# A class for a depth-limited expectimax search over the placements. The max
+# nodes are the placements of a tetromino and the chance nodes are the types
+# of the tetrominoes that are not created yet (7 types with the same
+# probability) and the exponents of their tiles. The current and the next
+# tetrominoes are known, so the chance nodes start from the depth 3. The
+# values of the searched boards are kept in a memo with LRU eviction.
+class Expectimax:
+   # the value used for the boards where the game is over in the averages of
+   # the chance nodes (a finite value, so that a move is still chosen when
+   # every move can lose the game)
+   game_over_value = -1e9
+
+   # A constructor for a search of the given depth (the number of tetrominoes
+   # placed), where only the width best placements of each max node (by the
+   # heuristic) are searched deeper, with a memo of at most cache_size boards
+   def __init__(self, depth=2, width=4, cache_size=100000):
+      self.depth, self.width = depth, width
+      self.cache, self.cache_size = OrderedDict(), cache_size
+      # the statistics: the boards evaluated (nodes), the memo lookups and
+      # hits and the time spent on the searches
+      self.nodes, self.lookups, self.hits, self.time = 0, 0, 0, 0.0
+
+   # A method that returns the best placement of the given current tetromino
+   # on the given board as (value, rotation, number of rotations, column), or
+   # None when the tetromino cannot be placed. The next tetromino is known.
+   def search(self, board, piece, next_piece=None):
+      start_time = time.perf_counter()
+      known = ((next_piece.type, tuple(next_piece.exponents)),) \
+         if next_piece is not None else ()
+      best = None
+      children = []
+      for rotation, n_rotations, x in get_placements(board, piece):
+         child = place(board, piece.states[rotation], piece.exponents, x)
+         children.append((self.static_value(child), rotation, n_rotations, x, child))
+      children.sort(key=lambda child: child[0], reverse=True)
+      for value, rotation, n_rotations, x, child in children[:self.width]:
+         if self.depth > 1:
+            value = self.value(child, known, self.depth - 1)
+         if best is None or value > best[0]:
+            best = (value, rotation, n_rotations, x)
+      self.time += time.perf_counter() - start_time
+      return best
+
+   # A method that returns the heuristic value of a board (see evaluate)
+   def static_value(self, board):
+      self.nodes += 1
+      return evaluate(board)
+
+   # A method that returns the expected value of the given board after the
+   # given number of tetrominoes are placed on it, where the first ones are
+   # the known (type, exponents) tetrominoes and the others are chance nodes
+   def value(self, board, known, depth):
+      if board.game_over:
+         return self.game_over_value
+      if depth == 0:
+         return self.static_value(board)
+      # the score only shifts the values of the boards below this one, so the
+      # memo keeps the values without the score of this board (the changed
+      # tiles are a part of the key, as the Zobrist key does not cover which
+      # tiles the next settle checks for free tiles)
+      key = (board.zobrist_key, tuple(board.changed_masks), known[:depth],
+             depth)
+      shift = weights["score"] * board.score
+      self.lookups += 1
+      if key in self.cache:
+         self.hits += 1
+         self.cache.move_to_end(key)
+         return self.cache[key] + shift
+      if known:
+         shape, exponents = known[0]
+         value = self.max_value(board, shape, exponents, known[1:], depth)
+      else:
+         value = 0.0
+         for shape in tetromino_types:
+            for exponents in exponent_outcomes:
+               value += self.max_value(board, shape, exponents, (), depth)
+         value /= len(tetromino_types) * len(exponent_outcomes)
+      self.cache[key] = value - shift
+      if len(self.cache) > self.cache_size:
+         self.cache.popitem(last=False)  # evict the least recently used board
+      return value
+
+   # A method that returns the value of the best placement of a tetromino of
+   # the given type with the given exponents on the given board, where the
+   # width best placements are searched to the given depth
+   def max_value(self, board, shape, exponents, known, depth):
+      children = [place(board, state, exponents, x)
+                  for state, x in get_entry_placements(board, shape)]
+      if not children:
+         return self.game_over_value
+      if depth == 1:
+         return max(max(self.static_value(child), self.game_over_value)
+                    for child in children)
+      children.sort(key=self.static_value, reverse=True)
+      return max(self.value(child, known, depth - 1)
+                 for child in children[:self.width])
+
+   # A method that returns the statistics of the searches as a string
+   def report(self):
+      nodes_per_second = self.nodes / self.time if self.time else 0.0
+      hit_rate = self.hits / self.lookups if self.lookups else 0.0
+      return ("nodes: %d, nodes/s: %.0f, cache hit rate: %.1f%% (%d/%d), "
+              "cached boards: %d" % (self.nodes, nodes_per_second,
+                                     100 * hit_rate, self.hits, self.lookups,
+                                     len(self.cache)))
+
+
+# A class for playing a game with the placement search. The actions for each
+# new tetromino are planned once and then given to the game as the keyboard
+# actions are given (see get_actions).
+class AutoPlayer:
+   # A constructor for a player that uses the given searcher (e.g., an
+   # Expectimax object) or the greedy placement search when it is None
+   def __init__(self, searcher=None):
+      self.searcher = searcher
+      self.tetromino = None  # the tetromino whose placement is planned
+      self.drop_pending = False
+      # the duration of the last search and the longest one in seconds
+      self.search_time, self.max_search_time = 0.0, 0.0
+
+   # A method that returns the actions to apply to the current tetromino of
+   # the given game in this tick: the rotations and the moves to the chosen
+   # column when a new tetromino enters the grid, then the hard drop in the
+   # next tick (so that the planned placement can be seen before it is locked)
+   def get_actions(self, game):
+      piece = game.current_tetromino
+      if game.game_over or piece is None:
+         return []
+      if piece is self.tetromino:
+         if self.drop_pending:
+            self.drop_pending = False
+            return ["space"]
+         return []
+      self.tetromino = piece
+      start_time = time.perf_counter()
+      if self.searcher is None:
+         best = search(game.grid, piece)
+      else:
+         best = self.searcher.search(game.grid, piece, game.next_tetromino)
+      self.search_time = time.perf_counter() - start_time
+      self.max_search_time = max(self.max_search_time, self.search_time)
+      if best is None:
+         return ["space"]
+      _, _, n_rotations, x = best
+      dx = x - piece.bottom_left_cell.x
+      self.drop_pending = True
+      return ["up"] * n_rotations + ["right" if dx > 0 else "left"] * abs(dx)
+
+
+# A policy for tournament.py that plays with an AutoPlayer kept on the game
+# (all the planned actions but the last one are applied here)
+def autoplay_policy(game):
+   if not hasattr(game, "autoplayer"):
+      game.autoplayer = AutoPlayer()
+   planned = game.autoplayer.get_actions(game)
+   for action in planned[:-1]:
+      game.apply_action(action)
+   return planned[-1] if planned else None
+
+
+# A policy for tournament.py that plays with the expectimax search (of the
+# default depth) instead of the greedy placement search
+def expectimax_policy(game):
+   if not hasattr(game, "autoplayer"):
+      game.autoplayer = AutoPlayer(Expectimax())
+   return autoplay_policy(game)
+
+
+# Playing a game with the expectimax search and printing its statistics, to
+# compare the speed and the results of the search depths (e.g., 100 pieces
+# with the seed 0: depth 1 at 11k nodes/s, depth 2 at 11k nodes/s with a 14.5%
+# cache hit rate and depth 3 with width 2 at 12k nodes/s, about 1.1 s per move)
+if __name__ == '__main__':
+   parser = argparse.ArgumentParser(description="Tetris 2048 expectimax bot")
+   parser.add_argument("--seed", type=int, default=0, help="the seed of the game")
+   parser.add_argument("--depth", type=int, default=2,
+                       help="the number of tetrominoes placed in the search")
+   parser.add_argument("--width", type=int, default=4,
+                       help="the number of placements searched deeper")
+   parser.add_argument("--cache-size", type=int, default=100000,
+                       help="the maximum number of boards in the memo")
+   parser.add_argument("--pieces", type=int, default=200,
+                       help="the maximum number of tetrominoes to place")
+   args = parser.parse_args()
+   searcher = Expectimax(args.depth, args.width, args.cache_size)
+   game = Game(seed=args.seed)
+   game.autoplayer = AutoPlayer(searcher)
+   while not game.game_over and game.pieces_placed < args.pieces:
+      action = autoplay_policy(game)
+      if action is not None:
+         game.apply_action(action)
+      game.step()
+   print("Score: %d, max tile: %d, pieces placed: %d, lines cleared: %d"
+         % (game.score, game.grid.max_tile(), game.pieces_placed,
+            game.lines_cleared))
+   print("Search time: %.2f s, %s" % (searcher.time, searcher.report()))
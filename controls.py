@@ -0,0 +1,57 @@
+################################################################################
+#                                                                              #
+# Reading the keys typed with auto repeat for the held movement keys           #
+#                                                                              #
+# All the keys typed since the last poll are returned in the order they were   #
+# typed, so no key is lost however fast the player types. A movement key that  #
+# is held down is repeated after the delayed auto shift (DAS) delay and then   #
+# at the auto repeat rate (ARR) interval as in the modern Tetris games. Only   #
+# the movement key pressed last is repeated while several ones are held down.  #
+#                                                                              #
+################################################################################
+import time
+
+import lib.stddraw as stddraw  # used for reading the keys typed
+
+# the keys that are repeated while they are held down
+repeat_keys = ("left", "right", "down")
+
+
+# A class for reading the keys typed and the repeats of the held keys
+class KeyRepeater:
+   # A constructor for creating a key repeater with the given DAS delay and
+   # ARR interval in milliseconds for the given keys
+   def __init__(self, delay=170, interval=50, keys=repeat_keys):
+      if delay < 0:
+         raise ValueError("the delayed auto shift must not be negative")
+      if interval <= 0:
+         raise ValueError("the auto repeat interval must be positive")
+      self.delay, self.interval = delay, interval
+      self.keys = keys
+      # the repeated key, the time at which it was pressed and the time of its
+      # next repeat on the monotonic clock (None when no key is repeated)
+      self.held = None
+
+   # A method that returns the keys typed since the last call in the order
+   # they were typed followed by the repeats of the held key that are due at
+   # the given time on the monotonic clock (the current time by default)
+   def get_keys(self, now=None):
+      if now is None:
+         now = time.monotonic()
+      keys = []
+      while stddraw.hasNextKeyTyped():
+         typed_time, key = stddraw.nextKeyEvent()
+         keys.append(key)
+         if key in self.keys:
+            self.held = (key, typed_time, typed_time + self.delay / 1000)
+      if self.held is not None:
+         key, pressed_time, next_time = self.held
+         # stop repeating the key when it is released (or pressed again)
+         if stddraw.keyDownTime(key) != pressed_time:
+            self.held = None
+         else:
+            while next_time <= now:
+               keys.append(key)
+               next_time += self.interval / 1000
+            self.held = (key, pressed_time, next_time)
+      return keys
@@ -0,0 +1,953 @@
+################################################################################
+#                                                                              #
+# The headless game engine of Tetris 2048 (board, pieces and game rules)       #
+#                                                                              #
+# This module never imports lib.stddraw or pygame, so that bots and batch      #
+# simulations can run the game rules at full speed without opening a window.   #
+# The GameGrid and Tetromino classes extend Board and Piece with drawing.      #
+#                                                                              #
+################################################################################
+import random  # used for creating tetrominoes and tiles with random values
+import struct  # used for packing the snapshots of the games
+from array import array  # used for storing the cell changes of the history
+import numpy as np  # fundamental Python module for scientific computing
+
+from point import Point  # used for tile positions
+
+# the types (shapes) of the tetrominoes that can enter the game grid
+tetromino_types = ['I', 'O', 'Z', 'J', 'L', 'T', 'S']
+
+# the size n of the n x n tile matrix and the occupied cells given as
+# (column_index, row_index) of each tetromino type in its initial rotation state
+tetromino_shapes = {
+   'I': (4, [(1, 0), (1, 1), (1, 2), (1, 3)]),
+   'O': (2, [(0, 0), (1, 0), (0, 1), (1, 1)]),
+   'Z': (3, [(0, 1), (1, 1), (1, 2), (2, 2)]),
+   'J': (3, [(0, 0), (0, 1), (1, 1), (2, 1)]),
+   'L': (3, [(0, 1), (1, 1), (2, 1), (2, 0)]),
+   'T': (3, [(0, 1), (1, 1), (2, 1), (1, 0)]),
+   'S': (3, [(0, 1), (1, 1), (1, 0), (2, 0)]),
+}
+
+# the actions that can be applied to the current tetromino (the index of an
+# action is used as its code, e.g., in the replay logs)
+actions = ["left", "right", "down", "up", "space"]
+
+# the exponents of the numbers (2 and 4) that a newly created tile can have
+tile_exponents = [1, 2]
+
+# the layout of the fixed size part of a game snapshot (see Game.snapshot):
+# score, ticks, pieces placed, lines cleared, game over flag, Zobrist key of
+# the grid and the type index, the rotation, the position and the 4 tile
+# exponents of the current and the next tetrominoes
+SNAPSHOT_HEADER = struct.Struct("<qqqq?Q" + "BBhh4B" * 2)
+# the layout of the state of the random number generator in a snapshot: the
+# version, the 625 words of the Mersenne Twister state and the optional next
+# Gaussian value (NaN when there is none)
+SNAPSHOT_RANDOM = struct.Struct("<B625Id")
+
+
+# A function that returns the number on a tile with the given exponent
+def tile_number(exponent):
+   return 1 << int(exponent)
+
+
+# A class for modeling a rotation state of a tetromino type. The rotation
+# states of all the tetromino types are computed once (see rotation_states) and
+# shared by all the tetrominoes for moving, rotating, locking and drawing them.
+class RotationState:
+   # A constructor that computes the rotation state from the size n of the
+   # n x n tile matrix and the (row, col) cells of its tiles in this matrix
+   def __init__(self, n, cells):
+      self.n = n
+      self.cells = cells
+      # the positions (dx, dy) of the tiles relative to the bottom left cell
+      self.offsets = [(col, (n - 1) - row) for row, col in cells]
+      # the bounding box of the tiles in the tile matrix
+      rows, cols = [row for row, _ in cells], [col for _, col in cells]
+      self.min_row, self.max_row = min(rows), max(rows)
+      self.min_col, self.max_col = min(cols), max(cols)
+      # the (row, col) cells of the tiles in the minimum bounded tile matrix
+      self.bounded_cells = [(row - self.min_row, col - self.min_col)
+                            for row, col in cells]
+      # the lowest tile (min dy) of each column dx
+      self.column_bottoms = {}
+      for dx, dy in self.offsets:
+         self.column_bottoms[dx] = min(dy, self.column_bottoms.get(dx, dy))
+      # the row bitmasks (dy, mask) of the tiles, where the bit dx of a mask is
+      # set if the tile at (dx, dy) is occupied, used for collision checks
+      masks = {}
+      for dx, dy in self.offsets:
+         masks[dy] = masks.get(dy, 0) | (1 << dx)
+      self.row_masks = sorted(masks.items())
+
+
+# A function that computes the 4 rotation states of the given tetromino type,
+# each obtained by rotating the previous one clockwise
+def get_rotation_states(shape):
+   n, occupied_cells = tetromino_shapes[shape]
+   cells = [(row, col) for col, row in occupied_cells]
+   states = []
+   for _ in range(4):
+      states.append(RotationState(n, cells))
+      # rotating the n x n tile matrix clockwise moves the cell (row, col) to
+      # the cell (col, n - 1 - row)
+      cells = [(col, (n - 1) - row) for row, col in cells]
+   return states
+
+
+# the rotation states of all the tetromino types (rotation_states[type][r] is
+# the state after r clockwise rotations from the initial rotation state)
+rotation_states = {shape: get_rotation_states(shape) for shape in tetromino_types}
+
+
+# A class for the random 64-bit keys of the Zobrist hashing of the game states
+# on grids of a given size. The key of a state is the XOR of the keys of its
+# parts: a (cell, exponent) key for each tile on the grid and the keys of the
+# type, the rotation, the position and the tile exponents of the current and
+# the next tetrominoes. As XOR is its own inverse, changing a cell only needs
+# two XORs (the old and the new key of the cell).
+class ZobristTable:
+   # the seed of the keys (fixed, so that the keys are the same in every
+   # process, e.g., for comparing the states found by different workers)
+   seed = 2048
+   # the number of exponents that a tile can have (as in the tile palette)
+   n_exponents = 64
+
+   # A constructor for creating the keys for a grid of the given size
+   def __init__(self, grid_h, grid_w):
+      self.rng = np.random.default_rng([self.seed, grid_h, grid_w])
+      # the keys of the (cell, exponent) pairs, where the empty cells (the
+      # exponent 0) have the key 0, as an array and as nested lists of ints
+      self.cell_array = self.get_keys(grid_h, grid_w, self.n_exponents)
+      self.cell_array[:, :, 0] = 0
+      self.cells = self.cell_array.tolist()
+      # the keys of the current (0) and the next (1) tetrominoes: the type,
+      # the rotation, the position of the bottom left cell (offset by 4, as
+      # it can be outside the grid) and the exponent of each tile
+      self.types = self.get_keys(2, len(tetromino_types)).tolist()
+      self.rotations = self.get_keys(2, 4).tolist()
+      self.xs = self.get_keys(2, grid_w + 8).tolist()
+      self.ys = self.get_keys(2, grid_h + 8).tolist()
+      self.exponents = self.get_keys(2, 4, self.n_exponents).tolist()
+
+   # A method that returns an array of random 64-bit keys of the given shape
+   def get_keys(self, *shape):
+      return self.rng.integers(0, 2 ** 64, size=shape, dtype=np.uint64)
+
+   # A method that returns the XOR of the keys of the given cells of a grid,
+   # where the exponents are given as an array of the rows and the columns
+   # starting from the given row and column
+   def get_cells_key(self, exponents, row=0, col=0):
+      n_rows, n_cols = exponents.shape
+      keys = self.cell_array[row:row + n_rows, col:col + n_cols]
+      keys = np.take_along_axis(keys, exponents[:, :, None].astype(np.intp), axis=2)
+      return int(np.bitwise_xor.reduce(keys, axis=None))
+
+
+# the Zobrist tables created so far (one for each grid size)
+zobrist_tables = {}
+
+
+# A function that returns the Zobrist table for grids of the given size
+def get_zobrist_table(grid_h, grid_w):
+   if (grid_h, grid_w) not in zobrist_tables:
+      zobrist_tables[(grid_h, grid_w)] = ZobristTable(grid_h, grid_w)
+   return zobrist_tables[(grid_h, grid_w)]
+
+
+# A class for modeling the game grid without any drawing. The locked tiles are
+# stored as the exponents of their numbers in a uint8 tile matrix (0 denotes an
+# empty cell) and the occupancy of each row is kept as a bitmask.
+class Board:
+   # A constructor for creating the game grid based on the given arguments
+   def __init__(self, grid_h, grid_w):
+      # set the dimensions of the game grid as the given arguments
+      self.grid_height = grid_h
+      self.grid_width = grid_w
+      # create a tile matrix to store the exponents of the tiles locked on the
+      # game grid and the occupancy bitmasks of its rows
+      self.tile_matrix = np.zeros((grid_h, grid_w), dtype=np.uint8)
+      self.row_masks = [0] * grid_h
+      # the height of each column (the skyline), i.e., 1 + the row index of the
+      # topmost tile in the column or 0 if the column is empty
+      self.column_heights = [0] * grid_w
+      # the bitmasks of the cells on each row whose tiles were removed or moved
+      # since the free tiles were last deleted (see delete_free_tiles)
+      self.changed_masks = [0] * grid_h
+      # the bitmask of a full row and the weights used for computing bitmasks
+      self.full_row_mask = (1 << grid_w) - 1
+      self.column_bits = 1 << np.arange(grid_w, dtype=np.int64)
+      # the Zobrist key of the tiles on the grid, which is updated with each
+      # change of a cell (see ZobristTable)
+      self.zobrist = get_zobrist_table(grid_h, grid_w)
+      self.zobrist_key = 0
+      # a list that gets the (row, col, old exponent) of each changed cell
+      # while it is set (used for the undo history, see History)
+      self.journal = None
+      # a list that gets the effects of settling the grid while it is set (used
+      # for animating them, see settle)
+      self.effects = None
+      # the tetromino that is currently being moved on the game grid and the
+      # tetromino that will enter the game grid next
+      self.current_tetromino = None
+      self.next_tetromino = None
+      # the game_over flag shows whether the game is over or not
+      self.game_over = False
+      self.score = 0
+
+   def set_next_tetromino(self, next_tetromino):
+      self.next_tetromino = next_tetromino
+
+   # A method that returns a copy of this grid (without the tetrominoes) that
+   # can be modified without changing this grid
+   def copy(self):
+      board = Board(self.grid_height, self.grid_width)
+      board.tile_matrix[:] = self.tile_matrix
+      board.row_masks = list(self.row_masks)
+      board.column_heights = list(self.column_heights)
+      board.changed_masks = list(self.changed_masks)
+      board.game_over = self.game_over
+      board.score = self.score
+      board.zobrist_key = self.zobrist_key
+      return board
+
+   # A method that returns the largest number on the tiles of the grid
+   def max_tile(self):
+      return tile_number(self.tile_matrix.max()) if self.tile_matrix.any() else 0
+
+   # A method for setting the exponent of the tile in the given cell (0 makes
+   # the cell empty) and updating the bitmask of its row and the column height
+   def set_tile(self, row, col, exponent):
+      old_exponent = self.tile_matrix[row][col]
+      keys = self.zobrist.cells[row][col]
+      self.zobrist_key ^= keys[old_exponent] ^ keys[exponent]
+      if self.journal is not None:
+         self.journal.append((row, col, old_exponent))
+      self.tile_matrix[row][col] = exponent
+      if exponent:
+         self.row_masks[row] |= 1 << col
+         if row >= self.column_heights[col]:
+            self.column_heights[col] = row + 1
+      else:
+         self.row_masks[row] &= ~(1 << col)
+         # find the new topmost tile when the topmost tile is removed
+         if row == self.column_heights[col] - 1:
+            height = row
+            while height > 0 and not (self.row_masks[height - 1] >> col) & 1:
+               height -= 1
+            self.column_heights[col] = height
+
+   # A method for marking the cells given by a bitmask on the given row as
+   # changed, i.e., their tiles were removed or moved (adding tiles does not
+   # need to be marked as it cannot disconnect any tile from the bottom row)
+   def mark_changed(self, row, mask):
+      self.changed_masks[row] |= mask
+
+   # A method that computes the Zobrist key of the tiles on the grid from all
+   # the cells (the key is normally updated with each change, see set_tile)
+   def compute_zobrist_key(self):
+      return self.zobrist.get_cells_key(self.tile_matrix)
+
+   # A method for recomputing the row bitmasks and the column heights after
+   # the tile matrix is modified directly (e.g., by array operations)
+   def update_occupancy(self):
+      occupied = self.tile_matrix != 0
+      self.row_masks = (occupied @ self.column_bits).tolist()
+      # the topmost occupied row of each column is the first one from the top
+      top = self.grid_height - np.argmax(occupied[::-1], axis=0)
+      self.column_heights = np.where(occupied.any(axis=0), top, 0).tolist()
+
+   # A method used checking whether the grid cell with the given row and column
+   # indexes is occupied by a tile or not (i.e., empty)
+   def is_occupied(self, row, col):
+      # considering the newly entered tetrominoes to the game grid that may
+      # have tiles with position.y >= grid_height
+      if not self.is_inside(row, col):
+         return False  # the cell is not occupied as it is outside the grid
+      # the cell is occupied by a tile if its bit is set in the row bitmask
+      return (self.row_masks[row] >> col) & 1 == 1
+
+   # A method for checking whether the cell with the given row and col indexes
+   # is inside the game grid or not
+   def is_inside(self, row, col):
+      if row < 0 or row >= self.grid_height:
+         return False
+      if col < 0 or col >= self.grid_width:
+         return False
+      return True
+
+   # A method for checking whether the tiles of a tetromino in the given
+   # rotation state can be placed on the grid when the bottom left cell of its
+   # tile matrix is at the given position (by using the row bitmasks)
+   def can_be_placed(self, state, x, y):
+      # the tiles must be inside the left and the right boundaries of the grid
+      if x + state.min_col < 0 or x + state.max_col >= self.grid_width:
+         return False
+      for dy, mask in state.row_masks:
+         row = y + dy
+         # the tiles must be above the bottom boundary of the grid
+         if row < 0:
+            return False
+         # the tiles above the grid cannot overlap with the locked tiles
+         if row < self.grid_height:
+            shifted = mask << x if x >= 0 else mask >> -x
+            if self.row_masks[row] & shifted:
+               return False
+      return True
+
+   # A method that returns the row of the bottom left cell where a tetromino in
+   # the given rotation state lands when it is dropped from above the column
+   # heights (the skyline) with the bottom left cell at the given column, i.e.,
+   # the lowest row where none of its columns is below the skyline
+   def get_landing_row(self, state, x):
+      return max(self.column_heights[x + dx] - bottom
+                 for dx, bottom in state.column_bottoms.items())
+
+   # A method that locks the given (row, col, exponent) tiles of a landed
+   # tetromino on the grid (returns True when the game is over)
+   def lock_tiles(self, tiles):
+      # the current tetromino is no longer moved on the game grid
+      self.current_tetromino = None
+      for row, col, exponent in tiles:
+         # place each tile onto the game grid
+         if self.is_inside(row, col):
+            self.set_tile(row, col, exponent)
+         # the game is over if any placed tile is above the game grid
+         else:
+            self.game_over = True
+      # return the value of the game_over flag
+      return self.game_over
+
+
+# A class for modeling tetrominoes without any drawing. A tetromino has a type,
+# a rotation state (see rotation_states), the exponents of the numbers on its
+# 4 tiles and the position of the bottom left cell of its n x n tile matrix.
+class Piece:
+   # A constructor for creating a tetromino with a given shape (type) for a
+   # game grid of the given size, where the numbers on its tiles and its
+   # horizontal position are determined by the given random number generator
+   # (the random module by default)
+   def __init__(self, shape, rng=random, grid_h=20, grid_w=12):
+      # the dimensions of the game grid of this tetromino (kept on each
+      # tetromino, as games with different grid sizes can run at once)
+      self.grid_height, self.grid_width = grid_h, grid_w
+      self.type = shape  # set the type of this tetromino
+      self.rotation = 0  # the initial rotation state
+      self.states = rotation_states[self.type]
+      # the exponents of the numbers on the tiles (in the order of the cells
+      # of the rotation states, so that each number moves with its tile)
+      self.exponents = [rng.choice(tile_exponents) for _ in range(4)]
+      # initialize the position of this tetromino (as the bottom left cell in
+      # the tile matrix) with a random horizontal position above the game grid
+      self.bottom_left_cell = Point()
+      self.bottom_left_cell.y = self.grid_height - 1
+      self.bottom_left_cell.x = rng.randint(0, self.grid_width - self.state.n)
+
+   # The current rotation state of this tetromino
+   @property
+   def state(self):
+      return self.states[self.rotation]
+
+   # A method that returns the positions on the game grid and the exponents of
+   # the tiles of this tetromino as a list of (row, col, exponent)
+   def get_tiles(self):
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      return [(y + dy, x + dx, exponent)
+              for (dx, dy), exponent in zip(self.state.offsets, self.exponents)]
+
+   # A method for moving this tetromino in a given direction by 1 on the grid
+   def move(self, direction, game_grid):
+      # check if this tetromino can be moved in the given direction by using
+      # the can_be_moved method defined below
+      if not (self.can_be_moved(direction, game_grid)):
+         return False  # the tetromino cannot be moved in the given direction
+      # move this tetromino by updating the position of its bottom left cell
+      if direction == "left":
+         self.bottom_left_cell.x -= 1
+      elif direction == "right":
+         self.bottom_left_cell.x += 1
+      else:  # direction == "down"
+         self.bottom_left_cell.y -= 1
+      return True  # a successful move in the given direction
+
+   # A method that returns the row of the bottom left cell where this
+   # tetromino lands when it is moved down until it cannot move anymore
+   def get_drop_row(self, game_grid):
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      landing_row = game_grid.get_landing_row(self.state, x)
+      # the tetromino is above the skyline in all of its columns
+      if landing_row <= y:
+         return landing_row
+      # otherwise it is under an overhang, so it is moved down one by one
+      while game_grid.can_be_placed(self.state, x, y - 1):
+         y -= 1
+      return y
+
+   # A method for dropping this tetromino down until it cannot move anymore
+   # (returns True if it is moved)
+   def drop(self, game_grid):
+      drop_row = self.get_drop_row(game_grid)
+      moved = drop_row != self.bottom_left_cell.y
+      self.bottom_left_cell.y = drop_row
+      return moved
+
+   # A method for checking if this tetromino can be moved in a given direction
+   def can_be_moved(self, direction, game_grid):
+      x, y = self.bottom_left_cell.x, self.bottom_left_cell.y
+      if direction == "left":
+         x -= 1
+      elif direction == "right":
+         x += 1
+      else:  # direction == "down"
+         y -= 1
+      # the tetromino can be moved if its tiles can be placed on the grid at
+      # the new position (a check with the row bitmasks of the rotation state)
+      return game_grid.can_be_placed(self.state, x, y)
+
+   # A method for rotating this tetromino clockwise on the grid
+   def rotate(self, game_grid):
+      rotation = (self.rotation + 1) % 4
+      # Check if the rotated tetromino can be placed on the grid
+      if self.can_be_placed(rotation, game_grid):
+         self.rotation = rotation
+         return True  # Return True to indicate successful rotation
+      else:
+         return False  # Return False if rotation is not possible
+
+   # A method for checking if this tetromino can be placed on the grid in the
+   # given rotation state without moving it
+   def can_be_placed(self, rotation, game_grid):
+      return game_grid.can_be_placed(self.states[rotation],
+                                     self.bottom_left_cell.x,
+                                     self.bottom_left_cell.y)
+
+   # A method that returns the type, the rotation, the position of the bottom
+   # left cell and the tile exponents of this tetromino as a tuple
+   def get_state(self):
+      return (self.type, self.rotation, self.bottom_left_cell.x,
+              self.bottom_left_cell.y, tuple(self.exponents))
+
+   # A method for setting the type, the rotation, the position of the bottom
+   # left cell and the tile exponents of this tetromino (e.g., when a game is
+   # restored from a snapshot)
+   def set_state(self, shape, rotation, x, y, exponents):
+      self.type = shape
+      self.rotation = rotation
+      self.states = rotation_states[shape]
+      self.exponents = list(exponents)
+      self.bottom_left_cell = Point(x, y)
+
+   # A method that returns the Zobrist key of this tetromino as the current
+   # (role 0) or the next (role 1) tetromino (see ZobristTable) with the given
+   # Zobrist table (by default, the table of the grid size of this tetromino)
+   def get_zobrist_key(self, role=0, table=None):
+      if table is None:
+         table = get_zobrist_table(self.grid_height, self.grid_width)
+      key = table.types[role][tetromino_types.index(self.type)] \
+         ^ table.rotations[role][self.rotation] \
+         ^ table.xs[role][self.bottom_left_cell.x + 4] \
+         ^ table.ys[role][self.bottom_left_cell.y + 4]
+      for tile_keys, exponent in zip(table.exponents[role], self.exponents):
+         key ^= tile_keys[exponent]
+      return key
+
+
+# Function to merge the vertically adjacent tiles with the same number on the
+# grid (returns the number of merges). A merged tile gets the doubled number,
+# the upper tile is removed and the tiles above it are shifted down by one
+# cell. Merging the lowest pair first and rescanning the grid after each merge
+# is the same as resolving each column from the bottom up with a stack, so
+# every column that has a pair to merge is resolved in a single pass.
+def merge_tiles(grid):
+   # the tiles on the topmost row are neither merged nor shifted
+   top = grid.grid_height - 1
+   tiles = grid.tile_matrix
+   before = tiles.copy() if grid.effects is not None else None
+   lower, upper = tiles[:top - 1], tiles[1:top]
+   # the columns that have at least one pair of tiles to merge
+   columns = np.nonzero(((lower == upper) & (upper != 0)).any(axis=0))[0]
+   merges = 0
+   for col in columns.tolist():
+      stack = []
+      for exponent in tiles[:top, col].tolist():
+         stack.append(exponent)
+         # merge the tile with the tile below it as long as they are equal
+         # (an empty cell is never merged)
+         while len(stack) > 1 and stack[-1] != 0 and stack[-1] == stack[-2]:
+            stack.pop()
+            stack[-1] += 1  # the merged value is doubled
+            grid.score += tile_number(stack[-1])
+            merges += 1
+      # the cells emptied by the merges are at the top of the column
+      column = stack + [0] * (top - len(stack))
+      for row, exponent in enumerate(tiles[:top, col].tolist()):
+         if exponent != column[row]:
+            grid.mark_changed(row, 1 << col)
+            keys = grid.zobrist.cells[row][col]
+            grid.zobrist_key ^= keys[exponent] ^ keys[column[row]]
+            if grid.journal is not None:
+               grid.journal.append((row, col, exponent))
+      tiles[:top, col] = column
+   if merges:
+      grid.update_occupancy()
+      if before is not None:
+         grid.effects.append(("merge", before, tiles.copy(),
+                              get_merge_moves(before, columns.tolist(), top)))
+   return merges
+
+
+# Function that returns where the tiles move when the given columns of the
+# given tile exponents are merged (see merge_tiles) as (row, col, new row)
+# tuples. Each tile moves to the cell of the tile it is merged into.
+def get_merge_moves(tiles, columns, top):
+   moves = []
+   for col in columns:
+      # the stacked tiles and the rows of the tiles merged into each of them
+      stack, rows = [], []
+      for row, exponent in enumerate(tiles[:top, col].tolist()):
+         stack.append(exponent)
+         rows.append([row])
+         while len(stack) > 1 and stack[-1] != 0 and stack[-1] == stack[-2]:
+            stack.pop()
+            stack[-1] += 1
+            merged_rows = rows.pop()
+            rows[-1] += merged_rows
+      for new_row, old_rows in enumerate(rows):
+         moves += [(row, col, new_row) for row in old_rows
+                   if row != new_row and tiles[row, col] != 0]
+   return moves
+
+
+# Function to grow the cells given by the row bitmasks seeds to all the cells
+# connected to them among the cells given by the row bitmasks cells (a flood
+# fill that processes all the cells on a row at once)
+def flood_fill(seeds, cells):
+   filled = [seed & mask for seed, mask in zip(seeds, cells)]
+   # the empty rows above the topmost cell are never filled, so they are not
+   # swept
+   n_rows = len(cells)
+   while n_rows > 0 and not cells[n_rows - 1]:
+      n_rows -= 1
+   # sweep the rows upwards and then downwards until nothing changes
+   sweep = list(range(n_rows)) + list(range(n_rows - 2, -1, -1))
+   changed = True
+   while changed:
+      changed = False
+      for row in sweep:
+         grown = filled[row]
+         if row > 0:
+            grown |= filled[row - 1]
+         if row < n_rows - 1:
+            grown |= filled[row + 1]
+         grown &= cells[row]
+         # spread to the left and to the right along the cells of the row
+         while True:
+            spread = (grown | (grown << 1) | (grown >> 1)) & cells[row]
+            if spread == grown:
+               break
+            grown = spread
+         if grown != filled[row]:
+            filled[row] = grown
+            changed = True
+   return filled
+
+
+# Function to detect and return a list of coordinates of free tiles in the grid
+# (the tiles that are not connected to the bottom row). As adding tiles cannot
+# disconnect any tile, only the tiles connected to the cells whose tiles were
+# removed or moved since the last check (see Board.mark_changed) are examined.
+def detect_free_tiles(grid):
+   free_tiles = []
+   if not any(grid.changed_masks):
+      return free_tiles
+   n_rows, changed = grid.grid_height, grid.changed_masks
+
+   # the occupied cells that are changed or next to a changed cell
+   seeds = []
+   for row in range(n_rows):
+      near = changed[row] | (changed[row] << 1) | (changed[row] >> 1)
+      if row > 0:
+         near |= changed[row - 1]
+      if row < n_rows - 1:
+         near |= changed[row + 1]
+      seeds.append(near & grid.row_masks[row])
+
+   # the tiles connected to these cells and the ones among them that are
+   # connected to the bottom row
+   touched = flood_fill(seeds, grid.row_masks)
+   connected = flood_fill([touched[0]] + [0] * (n_rows - 1), touched)
+
+   # Iterate over the touched tiles to detect free tiles
+   for row in range(n_rows):
+      free = touched[row] & ~connected[row]
+      while free:
+         col = (free & -free).bit_length() - 1  # the lowest set bit
+         free_tiles.append((row, col))
+         free &= free - 1
+
+   return free_tiles
+
+
+# Function to delete free tiles from the grid (returns the number of deleted
+# tiles)
+def delete_free_tiles(grid):
+   free_tiles = detect_free_tiles(grid)
+   if free_tiles and grid.effects is not None:
+      before = grid.tile_matrix.copy()
+   for row, col in free_tiles:
+      # Add the tile value to the total before deleting the tile
+      grid.score += tile_number(grid.tile_matrix[row][col])
+      grid.set_tile(row, col, 0)
+   if free_tiles and grid.effects is not None:
+      grid.effects.append(("free", before, grid.tile_matrix.copy(),
+                           [(row, col, None) for row, col in free_tiles]))
+   # all the remaining tiles are connected to the bottom row
+   grid.changed_masks = [0] * grid.grid_height
+   return len(free_tiles)
+
+
+# Function to remove the full rows from the tile exponents of a board with the
+# shape (H, W) or of a batch of boards with the shape (N, H, W) in place. The
+# rows above the full rows are shifted down with a single stable compaction.
+# (This function returns the number of removed rows and the sum of the numbers
+# on the removed tiles, for each board in the case of a batch.)
+def remove_full_rows(tiles):
+   # a boolean row mask of the full rows
+   full = (tiles != 0).all(axis=-1)
+   numbers = np.left_shift(1, tiles, dtype=np.int64)
+   scores = (numbers * full[..., None]).sum(axis=(-2, -1))
+   n_cleared = full.sum(axis=-1)
+   if not n_cleared.any():
+      return n_cleared, scores
+   # a stable sort moves the rows that are not full to the bottom in their
+   # original order and the full rows to the top, where they are emptied
+   order = np.argsort(full, axis=-1, kind='stable')
+   tiles[...] = np.take_along_axis(tiles, order[..., None], axis=-2)
+   tiles[np.take_along_axis(full, order, axis=-1)] = 0
+   return n_cleared, scores
+
+
+# Function to clear the full rows of the grid (the numbers on the cleared tiles
+# are added to the score) and to shift the rows above them down (returns the
+# number of cleared rows)
+def clear_full_rows(grid):
+   # the row bitmasks tell quickly if there is any full row to clear
+   if grid.full_row_mask not in grid.row_masks:
+      return 0
+   lowest_row = grid.row_masks.index(grid.full_row_mask)
+   if grid.effects is not None:
+      before = grid.tile_matrix.copy()
+      moves = get_clear_moves(before, grid.row_masks, grid.full_row_mask)
+   # only the rows from the lowest cleared row up change (Zobrist key)
+   old_tiles = grid.tile_matrix[lowest_row:].copy()
+   old_key = grid.zobrist.get_cells_key(old_tiles, lowest_row)
+   n_cleared, score = remove_full_rows(grid.tile_matrix)
+   new_tiles = grid.tile_matrix[lowest_row:]
+   grid.zobrist_key ^= old_key ^ grid.zobrist.get_cells_key(new_tiles, lowest_row)
+   if grid.journal is not None:
+      for row, col in zip(*np.nonzero(old_tiles != new_tiles)):
+         grid.journal.append((lowest_row + row, col, old_tiles[row, col]))
+   grid.score += int(score)
+   grid.update_occupancy()
+   # the tiles above the lowest cleared row are moved
+   for row in range(lowest_row, grid.grid_height):
+      grid.mark_changed(row, grid.full_row_mask)
+   if grid.effects is not None:
+      grid.effects.append(("clear", before, grid.tile_matrix.copy(), moves))
+   return int(n_cleared)
+
+
+# Function that returns where the tiles move when the full rows of the given
+# tile exponents with the given row bitmasks are cleared (see clear_full_rows)
+# as (row, col, new row) tuples. Each row moves down by the number of the full
+# rows below it, and the tiles on the full rows are removed (new row None).
+def get_clear_moves(tiles, row_masks, full_row_mask):
+   moves, n_full = [], 0
+   for row, mask in enumerate(row_masks):
+      if mask == full_row_mask:
+         n_full += 1
+         moves += [(row, col, None) for col in range(len(tiles[row]))]
+      elif n_full and mask:
+         moves += [(row, col, row - n_full)
+                   for col in np.nonzero(tiles[row])[0].tolist()]
+   return moves
+
+
+# Function to settle the grid after a tetromino is locked on it: all the merges
+# are applied, then the free tiles are deleted and the full rows are cleared
+# (returns the number of cleared rows). The final grid is computed at once; if
+# grid.effects is a list, each of these steps that changes the grid appends
+# its effect to it as a (kind, tiles before, tiles after, moves) tuple, where
+# kind is "merge", "free" or "clear" and moves lists the (row, col, new row) of
+# the moved tiles and the (row, col, None) of the removed tiles, so that the
+# steps can be animated afterwards.
+def settle(grid):
+   merge_tiles(grid)
+   delete_free_tiles(grid)
+   return clear_full_rows(grid)
+
+
+# A class for storing an undo history entry: the changes of the grid made by
+# locking a tetromino and settling the grid, and the tetrominoes and the counts
+# before and after them. Each changed cell is packed into a single 32-bit
+# integer (cell index << 16 | old exponent << 8 | new exponent), so the entries
+# stay small even for very long games.
+class HistoryEntry:
+   __slots__ = ('cells', 'score', 'lines_cleared', 'pieces_placed',
+                'game_over', 'changed_before', 'changed_after',
+                'pieces_before', 'pieces_after')
+
+
+# A class for the undo/redo history of the placements of a game (see Game.undo
+# and Game.redo). The cells changed by a placement are collected by the
+# journal of the grid while the tetromino is locked and the grid is settled.
+class History:
+   def __init__(self):
+      self.undo_stack, self.redo_stack = [], []
+      self.entry = None  # the entry of the placement that is being made
+
+   # A method that starts recording a placement on the given game
+   def begin(self, game):
+      grid = game.grid
+      entry = self.entry = HistoryEntry()
+      entry.score, entry.lines_cleared = grid.score, game.lines_cleared
+      entry.pieces_placed, entry.game_over = game.pieces_placed, grid.game_over
+      entry.changed_before = tuple(grid.changed_masks) if any(grid.changed_masks) else None
+      entry.pieces_before = (game.entry_state, game.next_tetromino.get_state())
+      grid.journal = []
+
+   # A method that ends recording the placement on the given game and pushes
+   # its entry to the undo stack (a new placement clears the redo stack)
+   def end(self, game):
+      grid, entry = game.grid, self.entry
+      # the first old exponent of each cell is its exponent before the placement
+      old_exponents = {}
+      for row, col, exponent in grid.journal:
+         old_exponents.setdefault((row, col), int(exponent))
+      grid.journal = None
+      width, tiles = grid.grid_width, grid.tile_matrix
+      entry.cells = array('I', [((row * width + col) << 16) | (old << 8) | int(tiles[row][col])
+                                for (row, col), old in old_exponents.items()
+                                if tiles[row][col] != old])
+      entry.score = grid.score - entry.score
+      entry.lines_cleared = game.lines_cleared - entry.lines_cleared
+      entry.pieces_placed = game.pieces_placed - entry.pieces_placed
+      entry.changed_after = tuple(grid.changed_masks) if any(grid.changed_masks) else None
+      # the tetromino that ends the game stays where it was locked, so its
+      # locked state is restored when the placement is redone
+      current = game.current_tetromino.get_state() if grid.game_over \
+         else game.entry_state
+      entry.pieces_after = (current, game.next_tetromino.get_state())
+      self.undo_stack.append(entry)
+      self.redo_stack.clear()
+      self.entry = None
+
+   # A method that reverts (undo) or reapplies (redo) the given entry on the
+   # given game in O(changed cells)
+   def apply(self, game, entry, undo):
+      grid = game.grid
+      width, sign = grid.grid_width, -1 if undo else 1
+      for cell in entry.cells:
+         index = cell >> 16
+         exponent = (cell >> 8) & 0xFF if undo else cell & 0xFF
+         grid.set_tile(index // width, index % width, exponent)
+      grid.score += sign * entry.score
+      game.lines_cleared += sign * entry.lines_cleared
+      game.pieces_placed += sign * entry.pieces_placed
+      # only the placement that ends the game places no tetromino
+      grid.game_over = entry.game_over if undo else entry.pieces_placed == 0
+      changed = entry.changed_before if undo else entry.changed_after
+      grid.changed_masks = list(changed) if changed else [0] * grid.grid_height
+      current, next = entry.pieces_before if undo else entry.pieces_after
+      game.set_tetrominoes(game.make_tetromino(current), game.make_tetromino(next))
+      if grid.game_over:
+         grid.current_tetromino = None  # as after locking the last tetromino
+         # the entry state is still the one of the last tetromino
+         game.entry_state = entry.pieces_before[0]
+
+
+# A class for modeling a game of Tetris 2048 without any drawing, so that the
+# same game rules can be used by the interactive game, bots and simulations
+class Game:
+   # A constructor for creating a game with an empty grid of the given size;
+   # an existing grid and the class used for the tetrominoes can also be given
+   # (e.g., GameGrid and Tetromino for the interactive game). All the random
+   # values of the game are generated from the given seed, so a game with the
+   # same seed and the same actions at the same ticks is always the same.
+   def __init__(self, grid_h=20, grid_w=12, grid=None, piece_class=Piece,
+                seed=None):
+      self.grid = grid if grid is not None else Board(grid_h, grid_w)
+      self.piece_class = piece_class
+      # a random seed is chosen when no seed is given
+      self.seed = seed if seed is not None else random.getrandbits(63)
+      self.random = random.Random(self.seed)
+      # the number of gravity ticks (calls of the step method) so far
+      self.ticks = 0
+      # the number of tetrominoes locked on the grid and of the cleared rows
+      self.pieces_placed = 0
+      self.lines_cleared = 0
+      # an object with a record(tick, action) method (e.g., replay.Recorder)
+      # that is given every action applied to the current tetromino
+      self.recorder = None
+      # the undo history of the placements (a History object, no history is
+      # kept when it is None)
+      self.history = None
+      # create the current and the next tetrominoes
+      self.set_tetrominoes(self.create_tetromino(), self.create_tetromino())
+
+   @property
+   def score(self):
+      return self.grid.score
+
+   @property
+   def game_over(self):
+      return self.grid.game_over
+
+   # A method that returns the Zobrist key of the state of the game: the tiles
+   # on the grid and the current and the next tetrominoes
+   def get_zobrist_key(self):
+      # the keys of the tetrominoes come from the table of the grid itself
+      table = self.grid.zobrist
+      return self.grid.zobrist_key \
+         ^ self.current_tetromino.get_zobrist_key(0, table) \
+         ^ self.next_tetromino.get_zobrist_key(1, table)
+
+   # A method that returns a snapshot of the state of the game as bytes: the
+   # tiles on the grid, the cells to check for free tiles, the score and the
+   # counts, the current and the next tetrominoes and the state of the random
+   # number generator (about 3 KB for a 20x12 grid)
+   def snapshot(self):
+      grid = self.grid
+      pieces = []
+      for piece in (self.current_tetromino, self.next_tetromino):
+         pieces += [tetromino_types.index(piece.type), piece.rotation,
+                    piece.bottom_left_cell.x, piece.bottom_left_cell.y]
+         pieces += piece.exponents
+      version, words, gauss_next = self.random.getstate()
+      return b"".join((
+         SNAPSHOT_HEADER.pack(grid.score, self.ticks, self.pieces_placed,
+                              self.lines_cleared, grid.game_over,
+                              grid.zobrist_key, *pieces),
+         SNAPSHOT_RANDOM.pack(version, *words,
+                              float("nan") if gauss_next is None else gauss_next),
+         grid.tile_matrix.tobytes(),
+         np.array(grid.changed_masks, dtype=np.uint64).tobytes()))
+
+   # A method that restores the state of the game from a snapshot taken by
+   # the snapshot method (on a game with the same grid size)
+   def restore(self, data):
+      grid = self.grid
+      header = SNAPSHOT_HEADER.unpack_from(data)
+      (grid.score, self.ticks, self.pieces_placed, self.lines_cleared,
+       grid.game_over, grid.zobrist_key) = header[:6]
+      pieces = []
+      for i in (6, 14):
+         type_index, rotation, x, y = header[i:i + 4]
+         pieces.append(self.make_tetromino((tetromino_types[type_index],
+                                            rotation, x, y, header[i + 4:i + 8])))
+      self.set_tetrominoes(*pieces)
+      offset = SNAPSHOT_HEADER.size
+      state = SNAPSHOT_RANDOM.unpack_from(data, offset)
+      gauss_next = None if state[-1] != state[-1] else state[-1]  # NaN check
+      self.random.setstate((state[0], state[1:-1], gauss_next))
+      offset += SNAPSHOT_RANDOM.size
+      n_cells = grid.grid_height * grid.grid_width
+      grid.tile_matrix[:] = np.frombuffer(data, np.uint8, n_cells, offset).reshape(
+         grid.grid_height, grid.grid_width)
+      offset += n_cells
+      grid.changed_masks = np.frombuffer(data, np.uint64, grid.grid_height,
+                                         offset).tolist()
+      grid.update_occupancy()
+
+   # A method that makes the given tetrominoes the current and the next ones
+   # (the state of the current one is kept as its entry state for the undo
+   # history, so that an undone tetromino enters the grid again)
+   def set_tetrominoes(self, current, next):
+      self.current_tetromino, self.next_tetromino = current, next
+      self.entry_state = current.get_state()
+      self.grid.current_tetromino = current
+      self.grid.set_next_tetromino(next)
+
+   # A method that creates a tetromino with the given state (see get_state)
+   # without drawing any random values
+   def make_tetromino(self, state):
+      tetromino = self.piece_class.__new__(self.piece_class)
+      tetromino.grid_height = self.grid.grid_height
+      tetromino.grid_width = self.grid.grid_width
+      tetromino.set_state(*state)
+      return tetromino
+
+   # A method that undoes the last placement of a tetromino: the grid, the
+   # score and the counts are reverted and the undone tetromino enters the
+   # grid again (returns False when there is nothing to undo)
+   def undo(self):
+      if self.history is None or not self.history.undo_stack:
+         return False
+      if self.recorder is not None:
+         self.recorder.record(self.ticks, "undo")
+      entry = self.history.undo_stack.pop()
+      self.history.apply(self, entry, undo=True)
+      self.history.redo_stack.append(entry)
+      return True
+
+   # A method that redoes the last undone placement (returns False when there
+   # is nothing to redo)
+   def redo(self):
+      if self.history is None or not self.history.redo_stack:
+         return False
+      if self.recorder is not None:
+         self.recorder.record(self.ticks, "redo")
+      entry = self.history.redo_stack.pop()
+      self.history.apply(self, entry, undo=False)
+      self.history.undo_stack.append(entry)
+      return True
+
+   # A method for creating random shaped tetrominoes to enter the game grid
+   def create_tetromino(self):
+      # the type (shape) of the tetromino is determined randomly
+      random_index = self.random.randint(0, len(tetromino_types) - 1)
+      random_type = tetromino_types[random_index]
+      # create and return the tetromino
+      return self.piece_class(random_type, self.random,
+                              self.grid.grid_height, self.grid.grid_width)
+
+   # A method that applies a user action ("left", "right", "down", "up" or
+   # "space") to the current tetromino (returns True if it moved or rotated)
+   def apply_action(self, action):
+      if self.game_over or action not in actions:
+         return False
+      if self.recorder is not None:
+         self.recorder.record(self.ticks, action)
+      if action in ("left", "right", "down"):
+         return self.current_tetromino.move(action, self.grid)
+      elif action == "up":
+         return self.current_tetromino.rotate(self.grid)
+      else:  # action == "space"
+         # Move down until cannot move anymore
+         return self.current_tetromino.drop(self.grid)
+
+   # A method that advances the game by one gravity tick: the current tetromino
+   # is moved down, or it is locked on the grid when it cannot move down
+   # anymore (returns True if the tetromino is locked and False otherwise)
+   def step(self):
+      if self.game_over:
+         return False
+      self.ticks += 1
+      if self.current_tetromino.move("down", self.grid):
+         return False
+      self.lock()
+      return True
+
+   # A method that locks the current tetromino on the grid, settles the grid
+   # and lets the next tetromino enter the game grid (unless the game is over)
+   def lock(self):
+      if self.history is not None:
+         self.history.begin(self)
+      # the tetrominoes do not change when the game is over
+      if not self.grid.lock_tiles(self.current_tetromino.get_tiles()):
+         self.pieces_placed += 1
+         self.lines_cleared += settle(self.grid)
+         self.set_tetrominoes(self.next_tetromino, self.create_tetromino())
+      if self.history is not None:
+         self.history.end(self)
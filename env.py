@@ -0,0 +1,77 @@
+################################################################################
+#                                                                              #
+# A gym-style environment for controlling Tetris 2048 from programs            #
+#                                                                              #
+# The environment wraps a game on a GameGrid with Tetromino pieces, so agents  #
+# play exactly the game that is displayed by Tetris_2048.py, but it never      #
+# draws anything (no window is opened). The board in the observations is a     #
+# read-only view of the tile exponents stored on the game grid: it is created  #
+# once per episode and always shows the current board without any copying.    #
+#                                                                              #
+################################################################################
+from engine import Game, actions, tetromino_types  # the headless game engine
+from game_grid import GameGrid  # the class for modeling the game grid
+from tetromino import Tetromino  # the class for modeling the tetrominoes
+
+# the code used for applying no action in a step (the other action codes are
+# the indexes of the actions in engine.actions)
+NO_ACTION = -1
+
+
+# A class for playing Tetris 2048 one gravity tick at a time with the methods
+# reset(seed) and step(action) of the gym environments
+class TetrisEnv:
+   # the number of the action codes (the actions in engine.actions)
+   n_actions = len(actions)
+
+   # A constructor for creating an environment with grids of the given size
+   def __init__(self, grid_h=20, grid_w=12):
+      self.grid_height, self.grid_width = grid_h, grid_w
+      self.game = None
+      self.board = None
+
+   # A method for starting a new episode with the given seed (a random seed
+   # when it is None) that returns the first observation and an info dictionary
+   def reset(self, seed=None):
+      grid = GameGrid(self.grid_height, self.grid_width)
+      self.game = Game(grid=grid, piece_class=Tetromino, seed=seed)
+      # a read-only view of the tile exponents of the grid (0 for empty cells)
+      self.board = grid.tile_matrix.view()
+      self.board.flags.writeable = False
+      return self.observation(), self.info()
+
+   # A method that applies the action with the given code (an index of
+   # engine.actions or NO_ACTION) to the current tetromino and advances the
+   # game by one gravity tick. It returns the observation, the reward (the
+   # increase of the score), whether the game is over, whether the episode is
+   # truncated (never) and an info dictionary as the gym environments do.
+   def step(self, action):
+      game = self.game
+      if game is None:
+         raise RuntimeError("reset() must be called before step()")
+      score = game.score
+      if action != NO_ACTION:
+         game.apply_action(actions[action])
+      game.step()
+      return (self.observation(), game.score - score, game.game_over, False,
+              self.info())
+
+   # A method that returns the current observation as a dictionary with the
+   # board view, the ids (indexes in engine.tetromino_types) of the current and
+   # the next tetrominoes and the rotation and the position of the current one
+   def observation(self):
+      current = self.game.current_tetromino
+      position = current.bottom_left_cell
+      return {"board": self.board,
+              "current": tetromino_types.index(current.type),
+              "next": tetromino_types.index(self.game.grid.next_tetromino.type),
+              "rotation": current.rotation,
+              "position": (position.x, position.y)}
+
+   # A method that returns the info dictionary with the score and the counts
+   # of the game
+   def info(self):
+      game = self.game
+      return {"score": game.score, "ticks": game.ticks,
+              "pieces_placed": game.pieces_placed,
+              "lines_cleared": game.lines_cleared}
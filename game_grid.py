@@ -3,23 +3,23 @@ from lib.color import Color  # used for coloring the game grid
 from point import Point  # used for tile positions
 import numpy as np  # fundamental Python module for scientific computing
 
-from tetromino import Tetromino
+from engine import Board  # the headless model of the game grid
+from tile import get_tile  # used for drawing the tiles on the game grid
+from tetromino import in_region  # used for drawing the tiles in a region
+from animation import Timeline  # used for animating the settle effects
 
 
-# A class for modeling the game grid
-class GameGrid:
+# A class for modeling the game grid (the game rules are defined in the Board
+# class and this class adds the methods for displaying the game grid)
+class GameGrid(Board):
+   # the layers of the static background drawn so far for each grid size and
+   # canvas scale (see get_background)
+   backgrounds = {}
+
    # A constructor for creating the game grid based on the given arguments
    def __init__(self, grid_h, grid_w):
-      # set the dimensions of the game grid as the given arguments
-      self.grid_height = grid_h
-      self.grid_width = grid_w
-      # create a tile matrix to store the tiles locked on the game grid
-      self.tile_matrix = np.full((grid_h, grid_w), None)
-      # create the tetromino that is currently being moved on the game grid
-      self.current_tetromino = None
-      self.next_tetromino = None
-      # the game_over flag shows whether the game is over or not
-      self.game_over = False
+      # create the tile matrix and the game state of the game grid
+      super().__init__(grid_h, grid_w)
       # set the color used for the empty grid cells
       self.empty_cell_color = Color(216, 192, 178)
       # set the colors used for the grid lines and the grid boundaries
@@ -28,43 +28,189 @@ class GameGrid:
       # thickness values used for the grid lines and the grid boundaries
       self.line_thickness = 0.001
       self.box_thickness = 5 * self.line_thickness
-      self.score = 0
-   
-   def set_next_tetromino(self, next_tetromino):
-        self.next_tetromino = next_tetromino
+      # the regions of the canvas (lower left x, y, width, height) redrawn
+      # when the score or the next tetromino changes
+      self.score_region = (-1, grid_h - 3.5, grid_w + 6, 1)
+      self.next_region = (grid_w + 0.9, 0.4, 4.1, 4.2)
+      # what was displayed in the last frame (see get_frame), used for
+      # redrawing only the changed regions (None when all must be redrawn)
+      self.last_frame = None
+      self.last_score, self.last_next_state = None, None
+      # the rectangles in pixels of the texts and the regions drawn on the
+      # canvas (used for redrawing them when they overlap a redrawn region)
+      self.text_rects = {}
+      # the timeline of the settle effects recorded in self.effects (which is
+      # None unless the effects are animated) and the effect drawn in the
+      # current frame with its progress (None when no effect is drawn)
+      self.timeline = Timeline()
+      self.animation = None
 
-   # A method for displaying the game grid
+   # A method for displaying the game grid. Only the regions of the canvas
+   # that changed since the last frame are redrawn and shown: the cells whose
+   # tiles, tetromino tiles or ghost outlines changed (usually the old and the
+   # new cells of the falling tetromino), the score and the next tetromino.
+   # It does not wait after showing the frame (the game loop sets the pace).
+   # While the effects of settling the grid are animated, the whole canvas is
+   # redrawn for each frame with the tiles of the animated effect.
    def display(self):
+      if self.effects:
+         self.timeline.add(self.effects)
+         self.effects.clear()
+      self.animation = self.timeline.get_current()
+      if self.animation is not None:
+         self.last_frame = None
+      frame = self.get_frame()
+      next_state = None
+      if self.next_tetromino is not None:
+         next_state = self.next_tetromino.get_state()
+      # collect the drawing commands of the frame in a draw list that is
+      # drawn in one batch when the frame is shown
+      stddraw.beginBatch()
+      if self.last_frame is None:
+         # redraw and show the whole canvas
+         self.draw_region()
+         stddraw.show(0)
+      else:
+         rects = [self.draw_region(col - 0.5, row - 0.5, 1, 1)
+                  for row, col in zip(*np.nonzero(frame != self.last_frame))]
+         if self.score != self.last_score:
+            rects.append(self.draw_region(*self.score_region))
+         if next_state != self.last_next_state:
+            rects.append(self.draw_region(*self.next_region))
+         # show the redrawn regions
+         stddraw.showRegions(rects)
+      # the frame after an animated frame is redrawn as a whole
+      self.last_frame = frame if self.animation is None else None
+      self.last_score, self.last_next_state = self.score, next_state
+
+   # A method that stops animating the settle effects (e.g., when the tiles
+   # are changed by undoing a placement)
+   def stop_animations(self):
+      self.timeline.clear()
+      if self.effects:
+         self.effects.clear()
+      self.last_frame = None
+
+   # A method that makes the next frame redraw the whole canvas (e.g., after
+   # the canvas is used for drawing something else)
+   def invalidate(self):
+      self.last_frame = None
+
+   # A method that returns what is displayed in each cell of the game grid as
+   # an array of codes (the exponent of the locked tile, the exponent of the
+   # tile of the current tetromino << 6 and the ghost outline << 12)
+   def get_frame(self):
+      frame = self.tile_matrix.astype(np.int32)
+      if self.current_tetromino is not None:
+         for row, col in self.current_tetromino.get_ghost_cells(self):
+            if row < self.grid_height:
+               frame[row, col] |= 1 << 12
+         for row, col, exponent in self.current_tetromino.get_tiles():
+            if row < self.grid_height:
+               frame[row, col] |= exponent << 6
+      return frame
+
+   # A method that draws the rectangle of the canvas with the given lower left
+   # point, width and height (the whole canvas when it is not given) in the
+   # same order as a whole frame, so that the redrawn region looks the same
+   # as the whole frame. It returns the redrawn rectangle in pixels.
+   def draw_region(self, x=None, y=None, w=None, h=None):
+      clip = stddraw.setClip(x, y, w, h)
+      # the cells whose tiles can be drawn into the region (including the
+      # neighboring cells, as the boxes of their tiles are slightly larger)
+      region = None
+      if clip is not None:
+         region = (int(np.floor(y + 0.5)) - 1, int(np.ceil(y + h - 0.5)) + 1,
+                   int(np.floor(x + 0.5)) - 1, int(np.ceil(x + w - 0.5)) + 1)
+      # draw the static background (the empty cells, the grid lines, the
+      # boundaries and the labels) with a single copy
+      stddraw.drawLayer(self.get_background())
+      # draw the tiles locked on the game grid (or the animated tiles)
+      if self.animation is not None:
+         self.draw_effect(*self.animation)
+      else:
+         self.draw_grid(region)
+      # draw the current/active tetromino if it is not None
+      # (the case when the game grid is updated)
+      if self.current_tetromino is not None:
+         # draw the outline of where the tetromino would land below it
+         self.current_tetromino.draw_ghost(self, region)
+         self.current_tetromino.draw(region)
+      if self.overlaps(clip, "score"):
+         self.display_score()
+      if self.overlaps(clip, "next"):
+         self.display_next_tetromino()
+      stddraw.setClip()
+      return clip
+
+   # A method that checks if the given rectangle in pixels (None for the
+   # whole canvas) overlaps with the text or the region of the canvas with the
+   # given name that was drawn before
+   def overlaps(self, rect, name):
+      return rect is None or name not in self.text_rects \
+         or rect.colliderect(self.text_rects[name])
+
+   # A method that returns the layer of the static background of the game
+   # grid, which is drawn once for each grid size and canvas scale and drawn
+   # again only when the size or the scale of the canvas changes
+   def get_background(self):
+      key = (self.grid_height, self.grid_width, stddraw.canvasScale())
+      if key not in GameGrid.backgrounds:
+         GameGrid.backgrounds[key] = stddraw.renderLayer(self.draw_background)
+      return GameGrid.backgrounds[key]
 
+   # A method for drawing the static background of the game grid: the empty
+   # cells, the grid lines, the boundaries and the labels
+   def draw_background(self):
       # clear the background to empty_cell_color
       stddraw.clear(self.empty_cell_color)
+      stddraw.setPenColor(Color(0, 0, 0))
+      stddraw.setFontFamily("Arial")
       stddraw.setFontSize(18)
       stddraw.text(14.2, 11, "Press P to pause/unpause")
-      # draw the game grid
-      self.draw_grid()
-      # draw the current/active tetromino if it is not None
-      # (the case when the game grid is updated)
-      if self.current_tetromino is not None:
-         self.current_tetromino.draw()
+      stddraw.setFontSize(16)
+      stddraw.text(self.grid_width + 2, 6, "Next Tetromino")
+      self.draw_lines()
       # draw a box around the game grid
       self.draw_boundaries()
-      self.display_score()
-      self.display_next_tetromino()
-
-
-      # show the resulting drawing with a pause duration = 250 ms
-      stddraw.show(self.speed)
 
-   # A method for drawing the cells and the lines of the game grid
-   def draw_grid(self):
+   # A method for drawing the tiles locked on the game grid (only the ones in
+   # the given region of cells, see in_region)
+   def draw_grid(self, region=None):
       # for each cell of the game grid
       for row in range(self.grid_height):
          for col in range(self.grid_width):
             # if the current grid cell is occupied by a tile
-            if self.tile_matrix[row][col] is not None:
+            if self.tile_matrix[row][col] != 0 and in_region(row, col, region):
                # draw this tile
-               self.tile_matrix[row][col].draw(Point(col, row))
-      # draw the inner lines of the game grid
+               get_tile(self.tile_matrix[row][col]).draw(Point(col, row))
+
+   # A method for drawing the tiles of a settle effect (see engine.settle) at
+   # the given progress from 0 to 1: the moved tiles slide from their old cells
+   # to their new cells, the removed tiles disappear halfway through and the
+   # other tiles stay as they were before the effect
+   def draw_effect(self, effect, progress):
+      kind, before, after, moves = effect
+      new_rows = {(row, col): new_row for row, col, new_row in moves}
+      moved_tiles = []
+      for row, col in zip(*np.nonzero(before)):
+         row, col = int(row), int(col)
+         exponent = before[row][col]
+         new_row = new_rows.get((row, col), row)
+         if new_row is None:
+            if progress < 0.5:
+               get_tile(exponent).draw(Point(col, row))
+         elif new_row != row:
+            y = row + (new_row - row) * progress
+            moved_tiles.append((exponent, Point(col, y)))
+         else:
+            get_tile(exponent).draw(Point(col, row))
+      # the moved tiles are drawn over the other tiles
+      for exponent, position in moved_tiles:
+         get_tile(exponent).draw(position)
+
+   # A method for drawing the inner lines of the game grid
+   def draw_lines(self):
       stddraw.setPenColor(self.line_color)
       stddraw.setPenRadius(self.line_thickness)
       # x and y ranges for the game grid
@@ -88,50 +234,6 @@ class GameGrid:
       stddraw.rectangle(pos_x, pos_y, self.grid_width, self.grid_height)
       stddraw.setPenRadius()  # reset the pen radius to its default value
 
-   # A method used checking whether the grid cell with the given row and column
-   # indexes is occupied by a tile or not (i.e., empty)
-   def is_occupied(self, row, col):
-      # considering the newly entered tetrominoes to the game grid that may
-      # have tiles with position.y >= grid_height
-      if not self.is_inside(row, col):
-         return False  # the cell is not occupied as it is outside the grid
-      # the cell is occupied by a tile if it is not None
-      return self.tile_matrix[row][col] is not None
-
-   # A method for checking whether the cell with the given row and col indexes
-   # is inside the game grid or not
-   def is_inside(self, row, col):
-      if row < 0 or row >= self.grid_height:
-         return False
-      if col < 0 or col >= self.grid_width:
-         return False
-      return True
-
-   # A method that locks the tiles of a landed tetromino on the grid checking
-   # if the game is over due to having any tile above the topmost grid row.
-   # (This method returns True when the game is over and False otherwise.)
-   def update_grid(self, tiles_to_lock, blc_position):
-      # necessary for the display method to stop displaying the tetromino
-      self.current_tetromino = None
-      # lock the tiles of the current tetromino (tiles_to_lock) on the grid
-      n_rows, n_cols = len(tiles_to_lock), len(tiles_to_lock[0])
-      for col in range(n_cols):
-         for row in range(n_rows):
-            # place each tile (occupied cell) onto the game grid
-            if tiles_to_lock[row][col] is not None:
-               # compute the position of the tile on the game grid
-               pos = Point()
-               pos.x = blc_position.x + col
-               pos.y = blc_position.y + (n_rows - 1) - row
-               if self.is_inside(pos.y, pos.x):
-                  self.tile_matrix[pos.y][pos.x] = tiles_to_lock[row][col]
-               # the game is over if any placed tile is above the game grid
-               else:
-                  self.game_over = True
-      # return the value of the game_over flag
-
-      return self.game_over
-
    def display_score(self):
          # set the font family and size for the score display
          stddraw.setFontFamily("Arial")
@@ -139,24 +241,19 @@ class GameGrid:
          # set the pen color for the score display
          stddraw.setPenColor(Color(0, 0, 0))
          # display the score text on the game grid
-         stddraw.text(self.grid_width + 1.5, self.grid_height - 3, "Score: " + str(self.score))
+         self.text_rects["score"] = stddraw.text(self.grid_width + 1.5, self.grid_height - 3, "Score: " + str(self.score))
          
       
    def display_next_tetromino(self):
-         # Draw the next tetromino
-         stddraw.setFontFamily("Arial")
-         stddraw.setFontSize(16)
-         stddraw.setPenColor(Color(0, 0, 0))
-         stddraw.text(self.grid_width + 2, 6, "Next Tetromino")
+         # Draw the next tetromino (the "Next Tetromino" label is drawn on
+         # the background)
+         self.text_rects["next"] = stddraw.pixelRect(*self.next_region)
 
          if self.next_tetromino is not None:
-            # Get the tiles of the next tetromino
-            tiles, _ = self.next_tetromino.get_min_bounded_tile_matrix(True)
-            if tiles is not None:  # Add this check to ensure tiles is not None
-               # Draw the tiles of the next tetromino
-               for row in range(len(tiles)):
-                  for col in range(len(tiles[0])):
-                     if tiles[row][col] is not None:
-                        # Increase the size of the drawn tiles by changing the second parameter
-                        position = Point(self.grid_width + 1.5 + col, 4 - row)
-                        tiles[row][col].draw(position, 1.0)  # Increase the size to 1.0
+            # Draw the tiles of the next tetromino at their cells in the minimum
+            # bounded tile matrix of its rotation state
+            state = self.next_tetromino.state
+            for (row, col), exponent in zip(state.bounded_cells, self.next_tetromino.exponents):
+               # Increase the size of the drawn tiles by changing the second parameter
+               position = Point(self.grid_width + 1.5 + col, 4 - row)
+               get_tile(exponent).draw(position, 1.0)  # Increase the size to 1.0
@@ -7,9 +7,11 @@ in the window.  As a convenience, the module also imports the
 commonly used Color objects defined in the color module.
 """
 
+import math
 import time
 import os
 import sys
+from collections import OrderedDict, deque
 
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = 'hide'
 import pygame
@@ -95,7 +97,27 @@ _canvasWidth = float(_DEFAULT_CANVAS_SIZE)
 _canvasHeight = float(_DEFAULT_CANVAS_SIZE)
 _penRadius = None
 _penColor = _DEFAULT_PEN_COLOR
-_keysTyped = []
+
+# The queue of the keys typed as (time, key) pairs in the order they
+# were typed (the times are on the monotonic clock) and the keys that
+# are held down with the times they were pressed.
+_keysTyped = deque()
+_keysDown = {}
+
+# The fonts created so far, keyed by (family, size, bold), and the
+# rendered texts, keyed by (string, family, size, bold, color) with
+# the least recently used ones evicted when there are more than
+# _TEXT_CACHE_SIZE of them.
+_fonts = {}
+_renderedTexts = OrderedDict()
+_TEXT_CACHE_SIZE = 1024
+
+# The pygame colors of the colors used so far, keyed by (r, g, b).
+_pygameColors = {}
+
+# The draw list collecting the drawing commands between beginBatch and
+# show (None when the drawing functions draw immediately).
+_drawList = None
 
 # Has the window been created?
 _windowCreated = False
@@ -123,10 +145,12 @@ def _pygameColor(c):
     Convert c, an object of type color.Color, to an equivalent object
     of type pygame.Color.  Return the result.
     """
-    r = c.getRed()
-    g = c.getGreen()
-    b = c.getBlue()
-    return pygame.Color(r, g, b)
+    key = (c.getRed(), c.getGreen(), c.getBlue())
+    color = _pygameColors.get(key)
+    if color is None:
+        color = pygame.Color(*key)
+        _pygameColors[key] = color
+    return color
 
 #-----------------------------------------------------------------------
 
@@ -268,6 +292,7 @@ def _pixel(x, y):
     Draw on the background canvas a pixel at (x, y).
     """
     _makeSureWindowCreated()
+    _flushBatch()
     xs = _scaleX(x)
     xy = _scaleY(y)
     pygame.gfxdraw.pixel(
@@ -281,6 +306,7 @@ def point(x, y):
     Draw on the background canvas a point at (x, y).
     """
     _makeSureWindowCreated()
+    _flushBatch()
     x = float(x)
     y = float(y)
     # If the radius is too small, then simply draw a pixel.
@@ -317,12 +343,11 @@ def line(x0, y0, x1, y1):
     y0s = _scaleY(y0)
     x1s = _scaleX(x1)
     y1s = _scaleY(y1)
-    pygame.draw.line(
-       _surface,
-       _pygameColor(_penColor),
-       (x0s, y0s),
-       (x1s, y1s),
-       int(round(lineWidth)))
+    _draw(pygame.draw.line,
+          _pygameColor(_penColor),
+          (x0s, y0s),
+          (x1s, y1s),
+          int(round(lineWidth)))
 
 def circle(x, y, r):
     """
@@ -330,6 +355,7 @@ def circle(x, y, r):
     (x, y).
     """
     _makeSureWindowCreated()
+    _flushBatch()
     x = float(x)
     y = float(y)
     r = float(r)
@@ -353,6 +379,7 @@ def filledCircle(x, y, r):
     centered on (x, y).
     """
     _makeSureWindowCreated()
+    _flushBatch()
     x = float(x)
     y = float(y)
     r = float(r)
@@ -389,11 +416,10 @@ def rectangle(x, y, w, h):
     else:
         xs = _scaleX(x)
         ys = _scaleY(y)
-        pygame.draw.rect(
-            _surface,
-            _pygameColor(_penColor),
-            pygame.Rect(xs, ys-hs, ws, hs),
-            int(round(_penRadius)))
+        _draw(pygame.draw.rect,
+              _pygameColor(_penColor),
+              pygame.Rect(xs, ys-hs, ws, hs),
+              int(round(_penRadius)))
 
 def filledRectangle(x, y, w, h):
     """
@@ -414,11 +440,10 @@ def filledRectangle(x, y, w, h):
     else:
         xs = _scaleX(x)
         ys = _scaleY(y)
-        pygame.draw.rect(
-            _surface,
-            _pygameColor(_penColor),
-            pygame.Rect(xs, ys-hs, ws, hs),
-            0)
+        _draw(pygame.draw.rect,
+              _pygameColor(_penColor),
+              pygame.Rect(xs, ys-hs, ws, hs),
+              0)
 
 def square(x, y, r):
     """
@@ -443,6 +468,7 @@ def polygon(x, y):
     """
     global _surface
     _makeSureWindowCreated()
+    _flushBatch()
     # Scale X and Y values.
     xScaled = []
     for xi in x:
@@ -467,6 +493,7 @@ def filledPolygon(x, y):
     """
     global _surface
     _makeSureWindowCreated()
+    _flushBatch()
     # Scale X and Y values.
     xScaled = []
     for xi in x:
@@ -489,10 +516,10 @@ def text(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _renderText(s, False)
     textpos = text.get_rect(center=(xs, ys))
-    _surface.blit(text, textpos)
+    _draw(None, text, textpos)
+    return textpos
 
 def boldText(x, y, s):
     """
@@ -503,10 +530,34 @@ def boldText(x, y, s):
     y = float(y)
     xs = _scaleX(x)
     ys = _scaleY(y)
-    font = pygame.font.SysFont(_fontFamily, _fontSize, True)
-    text = font.render(s, 1, _pygameColor(_penColor))
+    text = _renderText(s, True)
     textpos = text.get_rect(center=(xs, ys))
-    _surface.blit(text, textpos)
+    _draw(None, text, textpos)
+    return textpos
+
+def _renderText(s, bold):
+    """
+    Return a surface with string s rendered in the current font and
+    pen color (bold if bold is True). The fonts and the rendered
+    texts are cached, as finding a system font and rendering a text
+    are much slower than drawing the rendered text.
+    """
+    color = (_penColor.getRed(), _penColor.getGreen(), _penColor.getBlue())
+    key = (s, _fontFamily, _fontSize, bold, color)
+    text = _renderedTexts.get(key)
+    if text is not None:
+        _renderedTexts.move_to_end(key)
+        return text
+    fontKey = (_fontFamily, _fontSize, bold)
+    font = _fonts.get(fontKey)
+    if font is None:
+        font = pygame.font.SysFont(_fontFamily, _fontSize, bold)
+        _fonts[fontKey] = font
+    text = font.render(s, 1, pygame.Color(*color))
+    _renderedTexts[key] = text
+    if len(_renderedTexts) > _TEXT_CACHE_SIZE:
+        _renderedTexts.popitem(last=False)
+    return text
 
 def picture(pic, x=None, y=None):
     """
@@ -516,6 +567,7 @@ def picture(pic, x=None, y=None):
     """
     global _surface
     _makeSureWindowCreated()
+    _flushBatch()
     # By default, draw pic at the middle of the surface.
     if x is None:
         x = (_xmax + _xmin) / 2.0
@@ -530,12 +582,171 @@ def picture(pic, x=None, y=None):
     picSurface = pic._surface # violates encapsulation
     _surface.blit(picSurface, [xs-ws/2.0, ys-hs/2.0, ws, hs])
 
+def setClip(x=None, y=None, w=None, h=None):
+    """
+    Restrict the drawing on the background canvas to the rectangle of
+    width w and height h whose lower left point is (x, y), or remove
+    the restriction when no rectangle is given. Return the rectangle
+    in pixels (a pygame.Rect covering all the pixels that the
+    rectangle touches), or None when the restriction is removed.
+    """
+    _makeSureWindowCreated()
+    _flushBatch()
+    if x is None:
+        _surface.set_clip(None)
+        return None
+    rect = pixelRect(x, y, w, h)
+    _surface.set_clip(rect)
+    return rect
+
+def pixelRect(x, y, w, h):
+    """
+    Return the pixels of the background canvas that the rectangle of
+    width w and height h whose lower left point is (x, y) touches, as
+    a pygame.Rect clipped to the canvas.
+    """
+    _makeSureWindowCreated()
+    x0 = int(_scaleX(float(x)))
+    y0 = int(_scaleY(float(y) + float(h)))
+    x1 = -int(-_scaleX(float(x) + float(w)))  # rounded up
+    y1 = -int(-_scaleY(float(y)))
+    return pygame.Rect(x0, y0, x1 - x0, y1 - y0).clip(_surface.get_rect())
+
+def canvasScale():
+    """
+    Return the size of the canvas in pixels and the x and y scales as
+    a tuple (width, height, xmin, xmax, ymin, ymax), e.g. to check if
+    a layer drawn for a canvas can still be used.
+    """
+    return (_canvasWidth, _canvasHeight, _xmin, _xmax, _ymin, _ymax)
+
+def renderLayer(drawFunction):
+    """
+    Call drawFunction with the drawing functions drawing on a new
+    surface of the size of the canvas instead of the background
+    canvas, and return this surface as a layer that can be drawn on
+    the background canvas at once with drawLayer.
+    """
+    global _surface
+    _makeSureWindowCreated()
+    _flushBatch()
+    canvas = _surface
+    _surface = pygame.Surface(canvas.get_size())
+    try:
+        drawFunction()
+        _flushBatch()
+        layer = _surface
+    finally:
+        _surface = canvas
+    return layer
+
+def drawLayer(layer):
+    """
+    Draw a layer returned by renderLayer on the background canvas with
+    a single copy (limited to the rectangle given by setClip, if any).
+    """
+    _makeSureWindowCreated()
+    _flushBatch()
+    _surface.blit(layer, (0, 0))
+
+def renderSprite(w, h, drawFunction):
+    """
+    Call drawFunction with the drawing functions drawing on a new
+    transparent surface of w by h units (at the scale of the canvas)
+    whose center is (0, 0), and return this surface as a sprite that
+    can be drawn on the background canvas with a single copy by
+    drawSprite. The sprite can only be used with the scale it was
+    rendered at (see canvasScale).
+    """
+    global _surface, _canvasWidth, _canvasHeight, _xmin, _xmax, _ymin, _ymax
+    _makeSureWindowCreated()
+    _flushBatch()
+    ws = max(1, int(math.ceil(_factorX(float(w)))))
+    hs = max(1, int(math.ceil(_factorY(float(h)))))
+    # the user coordinates of the sprite keep the scale of the canvas
+    xr = ws * abs(_xmax - _xmin) / _canvasWidth / 2.0
+    yr = hs * abs(_ymax - _ymin) / _canvasHeight / 2.0
+    saved = (_surface, _canvasWidth, _canvasHeight, _xmin, _xmax, _ymin, _ymax)
+    _surface = pygame.Surface((ws, hs), pygame.SRCALPHA)
+    _canvasWidth, _canvasHeight = float(ws), float(hs)
+    _xmin, _xmax, _ymin, _ymax = -xr, xr, -yr, yr
+    try:
+        drawFunction()
+        _flushBatch()
+        sprite = _surface
+    finally:
+        (_surface, _canvasWidth, _canvasHeight,
+         _xmin, _xmax, _ymin, _ymax) = saved
+    return sprite
+
+def drawSprite(sprite, x, y):
+    """
+    Draw a sprite returned by renderSprite on the background canvas
+    centered on (x, y) (limited to the rectangle given by setClip, if
+    any).
+    """
+    _makeSureWindowCreated()
+    ws, hs = sprite.get_size()
+    _draw(None, sprite, (int(round(_scaleX(x) - ws / 2.0)),
+                         int(round(_scaleY(y) - hs / 2.0))))
+
+def beginBatch():
+    """
+    Start collecting the lines, rectangles, texts and sprites drawn on
+    the background canvas in a draw list instead of drawing them at
+    once. The draw list is drawn in one batch (with consecutive texts
+    and sprites copied by a single call) by the next show or
+    showRegions, which also stop the collecting, or before any drawing
+    function that is not collected, so the drawing order is kept.
+    """
+    global _drawList
+    _makeSureWindowCreated()
+    if _drawList is None:
+        _drawList = []
+
+def _draw(drawFunction, *args):
+    """
+    Draw on the background canvas with pygame function drawFunction
+    called with the background canvas and args, or copy the surface
+    args[0] to the position args[1] when drawFunction is None. Add the
+    command to the draw list instead while collecting (see beginBatch).
+    """
+    if _drawList is not None:
+        _drawList.append((drawFunction,) + args)
+    elif drawFunction is None:
+        _surface.blit(*args)
+    else:
+        drawFunction(_surface, *args)
+
+def _flushBatch():
+    """
+    Draw the commands collected in the draw list on the background
+    canvas and empty the draw list.
+    """
+    global _drawList
+    if not _drawList:
+        return
+    commands = _drawList
+    _drawList = []
+    blits = []
+    for command in commands:
+        if command[0] is None:
+            blits.append(command[1:])
+            continue
+        if blits:
+            _surface.blits(blits, False)
+            blits = []
+        command[0](_surface, *command[1:])
+    if blits:
+        _surface.blits(blits, False)
+
 def clear(c=WHITE):
     """
     Clear the background canvas to color c, where c is an
     object of class color.Color. c defaults to stddraw.WHITE.
     """
     _makeSureWindowCreated()
+    _flushBatch()
     _surface.fill(_pygameColor(c))
 
 def save(f):
@@ -543,6 +754,7 @@ def save(f):
     Save the window canvas to file f.
     """
     _makeSureWindowCreated()
+    _flushBatch()
 
     #if sys.hexversion >= 0x03000000:
     #    # Hack because Pygame without full image support
@@ -562,6 +774,7 @@ def _show():
     """
     Copy the background canvas to the window canvas.
     """
+    _flushBatch()
     _background.blit(_surface, (0, 0))
     pygame.display.flip()
     _checkForEvents()
@@ -588,19 +801,50 @@ def show(msec=float('inf')):
 
     _makeSureWindowCreated()
     _show()
+    _endBatch()
+    _wait(msec)
+
+def showRegions(rects, msec=0):
+    """
+    Copy only the given rectangles (pygame.Rect objects in pixels, see
+    setClip) of the background canvas to the window canvas, and then
+    wait for msec milliseconds. Only the copied rectangles of the
+    window are updated on the screen, so drawing and showing a few
+    changed regions costs much less than showing the whole canvas.
+    """
+    _makeSureWindowCreated()
+    _flushBatch()
+    if rects:
+        for rect in rects:
+            _background.blit(_surface, rect, rect)
+        pygame.display.update(rects)
+    _endBatch()
+    _wait(msec)
+
+def _endBatch():
+    """
+    Stop collecting the drawing commands in the draw list (after the
+    draw list was drawn, see _flushBatch).
+    """
+    global _drawList
+    _drawList = None
+
+def _wait(msec):
+    """
+    Check for events and wait for msec milliseconds.
+    """
     _checkForEvents()
 
-    # Sleep for the required time, but check for events every
-    # QUANTUM seconds.
+    # Sleep until msec milliseconds have passed on the monotonic clock
+    # (so the oversleeping of each sleep does not add up), but check for
+    # events every QUANTUM seconds.
     QUANTUM = .01
-    sec = msec / 1000.0
-    if sec < QUANTUM:
-        time.sleep(sec)
-        return
-    secondsWaited = 0.0
-    while secondsWaited < sec:
-        time.sleep(QUANTUM)
-        secondsWaited += QUANTUM
+    end = time.monotonic() + msec / 1000.0
+    while True:
+        sec = end - time.monotonic()
+        if sec <= 0:
+            return
+        time.sleep(min(sec, QUANTUM))
         _checkForEvents()
 
 #-----------------------------------------------------------------------
@@ -651,7 +895,6 @@ def _checkForEvents():
     pressed).  If a key has been typed, then put that key in a queue.
     """
     global _surface
-    global _keysTyped
     
     #-------------------------------------------------------------------
     # Begin added by Alan J. Broder
@@ -668,7 +911,16 @@ def _checkForEvents():
         if event.type == pygame.QUIT:
             sys.exit()
         elif event.type == pygame.KEYDOWN:
-            _keysTyped = [pygame.key.name(event.key)] + _keysTyped
+            key = pygame.key.name(event.key)
+            now = time.monotonic()
+            _keysTyped.append((now, key))
+            _keysDown[key] = now
+        elif event.type == pygame.KEYUP:
+            _keysDown.pop(pygame.key.name(event.key), None)
+        elif event.type == pygame.WINDOWFOCUSLOST:
+            # the keys released while the window has no focus are not
+            # reported
+            _keysDown.clear()
         elif (event.type == pygame.MOUSEBUTTONUP) and \
             (event.button == 3):
             _saveToFile()
@@ -690,28 +942,49 @@ def _checkForEvents():
 
 # Functions for retrieving keys
 
+def pollEvents():
+    """
+    Check for events (such as keys typed) without showing the
+    background canvas or waiting, e.g. in a loop that shows the
+    canvas less often than it checks for the keys typed.
+    """
+    _checkForEvents()
+
 def hasNextKeyTyped():
     """
     Return True if the queue of the keys the user typed is not empty.
     Otherwise return False.
     """
-    global _keysTyped
-    return _keysTyped != []
+    return len(_keysTyped) > 0
 
 def nextKeyTyped():
     """
     Remove the first key from the queue of the keys that the user typed,
     and return that key.
     """
-    global _keysTyped
-    return _keysTyped.pop()
+    return _keysTyped.popleft()[1]
+
+def nextKeyEvent():
+    """
+    Remove the first key from the queue of the keys that the user typed,
+    and return the time (on the monotonic clock, see time.monotonic) at
+    which it was typed and that key as a pair.
+    """
+    return _keysTyped.popleft()
 
 def clearKeysTyped():
     """
     Clear all the keys in the queue of the keys that the user typed.
     """
-    global _keysTyped
-    _keysTyped = []
+    _keysTyped.clear()
+
+def keyDownTime(key):
+    """
+    Return the time (on the monotonic clock) at which the user pressed
+    the key that is still held down, or None if the key is not held
+    down.
+    """
+    return _keysDown.get(key)
 
 #-----------------------------------------------------------------------
 # Begin added by Alan J. Broder
@@ -0,0 +1,145 @@
+################################################################################
+#                                                                              #
+# Recording and replaying games of Tetris 2048                                 #
+#                                                                              #
+# A replay log stores the seed and the grid size of a game and the actions     #
+# applied to its tetrominoes with the ticks at which they were applied. As     #
+# all the random values of a game come from its seed, replaying the actions    #
+# on a headless game gives the same final grid and score as the recorded game. #
+#                                                                              #
+# Usage: python replay.py REPLAY_FILE                                          #
+#                                                                              #
+################################################################################
+import struct  # used for packing the header of the replay logs
+import sys
+
+from engine import Game, History, actions  # the headless game engine
+
+# the first bytes of a replay log and the version of the log format
+MAGIC, VERSION = b"T2RP", 1
+# the header: magic, version, seed, grid height and grid width (the seed is a
+# signed 64-bit integer, as the seeds can be negative; the random seeds of the
+# games are 63-bit, and the logs of non-negative seeds are the same as with an
+# unsigned seed)
+HEADER = struct.Struct("<4sBqHH")
+# the events that can be recorded: the actions (the codes 0 to 4 are the
+# indexes of the actions in engine.actions) and undoing and redoing placements
+events = actions + ["undo", "redo"]
+# the code of the event that marks the tick at which the game ends
+END = 7
+
+
+# A function that appends a non-negative integer to the given bytearray as a
+# variable length integer (7 bits per byte, the high bit marks continuation)
+def write_varint(buffer, value):
+   while value >= 0x80:
+      buffer.append((value & 0x7F) | 0x80)
+      value >>= 7
+   buffer.append(value)
+
+
+# A function that reads a variable length integer from the given bytes at the
+# given offset and returns the integer and the offset of the next byte
+def read_varint(data, offset):
+   value, shift = 0, 0
+   while True:
+      byte = data[offset]
+      offset += 1
+      value |= (byte & 0x7F) << shift
+      if byte < 0x80:
+         return value, offset
+      shift += 7
+
+
+# A class for recording the actions of a game as a compact binary log. Each
+# event is a single variable length integer that holds the number of ticks
+# since the previous event and the code of the action (1 byte for most events).
+class Recorder:
+   # A constructor for creating a recorder for the given game (the recorder
+   # is attached to the game so that it is given every applied action)
+   def __init__(self, game):
+      if not -2 ** 63 <= game.seed < 2 ** 63:
+         raise ValueError("the seed of a recorded game must fit in 64 bits")
+      self.data = bytearray(HEADER.pack(MAGIC, VERSION, game.seed,
+                                        game.grid.grid_height,
+                                        game.grid.grid_width))
+      self.last_tick = 0
+      self.finished = False
+      game.recorder = self
+
+   # A method for recording an action (or an undo or a redo) applied at the
+   # given tick
+   def record(self, tick, action):
+      self.add_event(tick, events.index(action))
+
+   def add_event(self, tick, code):
+      write_varint(self.data, ((tick - self.last_tick) << 3) | code)
+      self.last_tick = tick
+
+   # A method that marks the end of the game at the given tick and returns the
+   # replay log as bytes
+   def finish(self, tick):
+      if not self.finished:
+         self.add_event(tick, END)
+         self.finished = True
+      return bytes(self.data)
+
+   # A method for saving the replay log of a game that ended at the given tick
+   # to the file with the given path
+   def save(self, path, tick):
+      with open(path, "wb") as file:
+         file.write(self.finish(tick))
+
+
+# A function that reads a replay log and returns the seed, the grid height and
+# width, the list of (tick, event) pairs and the tick at which the game ends
+def load(data):
+   magic, version, seed, grid_h, grid_w = HEADER.unpack_from(data)
+   if magic != MAGIC or version != VERSION:
+      raise ValueError("not a Tetris 2048 replay log (version %d)" % VERSION)
+   log, tick, end_tick = [], 0, None
+   offset = HEADER.size
+   while offset < len(data):
+      value, offset = read_varint(data, offset)
+      tick += value >> 3
+      code = value & 7
+      if code == END:
+         end_tick = tick
+         break
+      log.append((tick, events[code]))
+   # a log without an end event ends with its last action
+   if end_tick is None:
+      end_tick = tick
+   return seed, grid_h, grid_w, log, end_tick
+
+
+# A function that replays a replay log (given as bytes or as the path of a
+# file) on a headless game as fast as possible and returns the game
+def replay(data):
+   if isinstance(data, str):
+      with open(data, "rb") as file:
+         data = file.read()
+   seed, grid_h, grid_w, log, end_tick = load(data)
+   game = Game(grid_h, grid_w, seed=seed)
+   game.history = History()
+   for tick, event in log:
+      while game.ticks < tick and not game.game_over:
+         game.step()
+      if event == "undo":
+         game.undo()
+      elif event == "redo":
+         game.redo()
+      else:
+         game.apply_action(event)
+   while game.ticks < end_tick and not game.game_over:
+      game.step()
+   return game
+
+
+if __name__ == '__main__':
+   if len(sys.argv) != 2:
+      print("Usage: python replay.py REPLAY_FILE")
+      sys.exit(1)
+   game = replay(sys.argv[1])
+   print("Seed: %d, ticks: %d, game over: %s" % (game.seed, game.ticks, game.game_over))
+   print("Score: %d, max tile: %d" % (game.score, game.grid.max_tile()))
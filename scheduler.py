@@ -0,0 +1,92 @@
+################################################################################
+#                                                                              #
+# A fixed-timestep scheduler for the game loop                                 #
+#                                                                              #
+# The scheduler runs tasks (e.g., polling the input, moving the tetromino down #
+# and rendering the game grid) at their own intervals on a monotonic clock.    #
+# The next run time of a task is advanced by its interval from the previous    #
+# run time (not from the time the task actually ran), so the task rate does    #
+# not drift when the runs or the sleeps take longer than expected. A task      #
+# that falls behind makes up for at most max_steps missed runs at once and     #
+# then skips the rest (e.g., the rendering never draws the same frame twice).  #
+#                                                                              #
+################################################################################
+import time
+
+
+# A class for modeling a task that the scheduler runs periodically
+class Task:
+   # A constructor for creating a task that calls the given function every
+   # interval milliseconds and runs at most max_steps times when it is late
+   def __init__(self, interval, function, max_steps=1):
+      self.interval = interval
+      self.function = function
+      self.max_steps = max_steps
+      # a task is only run while it is active (e.g., not while paused)
+      self.active = True
+      # the time of the next run in seconds (set when the task is scheduled)
+      self.next_time = None
+
+
+# A class for running tasks at fixed intervals on a monotonic clock (the
+# clock and the sleep functions can be replaced, e.g. for running faster than
+# real time)
+class Scheduler:
+   # A constructor for creating a scheduler without any tasks
+   def __init__(self, clock=time.monotonic, sleep=time.sleep):
+      self.clock, self.sleep = clock, sleep
+      self.tasks = []
+      self.stopped = False
+
+   # A method that adds a task calling the given function every interval
+   # milliseconds (first after one interval) and returns it. The tasks that
+   # are due at the same time run in the order they were added.
+   def add(self, interval, function, max_steps=1):
+      task = Task(interval, function, max_steps)
+      task.next_time = self.clock() + interval / 1000
+      self.tasks.append(task)
+      return task
+
+   # A method for activating or deactivating a task (an activated task runs
+   # again after one interval, so pausing does not cause a burst of runs)
+   def set_active(self, task, active):
+      if active and not task.active:
+         task.next_time = self.clock() + task.interval / 1000
+      task.active = active
+
+   # A method that runs the tasks that are due and returns the number of runs
+   def run_pending(self):
+      runs = 0
+      for task in self.tasks:
+         now = self.clock()
+         steps = 0
+         while task.active and not self.stopped and task.next_time <= now:
+            if steps == task.max_steps:
+               # skip the missed runs that are not made up for
+               task.next_time = now + task.interval / 1000
+               break
+            task.function()
+            task.next_time += task.interval / 1000
+            steps += 1
+         runs += steps
+      return runs
+
+   # A method that sleeps until the next active task is due
+   def wait(self):
+      times = [task.next_time for task in self.tasks if task.active]
+      if times:
+         delay = min(times) - self.clock()
+         if delay > 0:
+            self.sleep(delay)
+
+   # A method that runs the tasks until stop is called (e.g., by a task)
+   def run(self):
+      self.stopped = False
+      while not self.stopped:
+         self.run_pending()
+         if not self.stopped:
+            self.wait()
+
+   # A method for stopping the scheduler after the running task returns
+   def stop(self):
+      self.stopped = True
@@ -0,0 +1,5 @@
+# the modules of the game are in the parent directory of the tests
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
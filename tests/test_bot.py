@@ -0,0 +1,61 @@
+################################################################################
+#                                                                              #
+# Checks that the boards simulated by the bot match the game                   #
+#                                                                              #
+################################################################################
+import random
+
+import numpy as np
+import pytest
+
+from bot import exponent_outcomes, place
+from engine import Game, rotation_states, tetromino_types
+
+
+# A function that checks that place gives the same board as the game gives
+# when a tetromino is dropped with a hard drop, for each rotation state of each
+# tetromino type in each column on the board of a game with the given seed
+# after n_pieces tetrominoes are dropped in random columns. It returns the
+# number of checked placements and the (type, rotation, column) of the ones
+# that give a different board, score or game over flag.
+def check_place(seed, n_pieces):
+   game = Game(seed=seed)
+   rng = random.Random(seed)
+   for _ in range(n_pieces):
+      for _ in range(rng.randint(0, 6)):
+         game.apply_action(rng.choice(["left", "right", "up"]))
+      game.apply_action("space")
+      game.step()
+   snapshot = game.snapshot()
+   grid = game.grid
+   n_checked, mismatches = 0, []
+   for shape in tetromino_types:
+      for rotation, state in enumerate(rotation_states[shape]):
+         for x in range(-state.min_col, grid.grid_width - state.max_col):
+            game.restore(snapshot)
+            y = grid.grid_height - 1
+            if grid.game_over or not grid.can_be_placed(state, x, y):
+               continue
+            exponents = list(rng.choice(exponent_outcomes))
+            expected = place(grid, state, exponents, x)
+            game.set_tetrominoes(game.make_tetromino((shape, rotation, x, y,
+                                                      exponents)),
+                                 game.next_tetromino)
+            game.apply_action("space")
+            game.step()  # the dropped tetromino is locked
+            n_checked += 1
+            if not (np.array_equal(expected.tile_matrix, grid.tile_matrix)
+                    and expected.score == grid.score
+                    and expected.game_over == grid.game_over):
+               mismatches.append((shape, rotation, x))
+   return n_checked, mismatches
+
+
+# The placements simulated by the bot give the same boards as the hard drops
+# in the game on empty and on low boards
+@pytest.mark.parametrize("seed", range(10))
+@pytest.mark.parametrize("n_pieces", [0, 3, 6])
+def test_place_matches_hard_drop(seed, n_pieces):
+   n_checked, mismatches = check_place(seed, n_pieces)
+   assert n_checked > 0
+   assert mismatches == []
@@ -0,0 +1,166 @@
+################################################################################
+#                                                                              #
+# Checks of the game engine against simple reference implementations           #
+#                                                                              #
+# The engine merges the tiles column by column, detects the free tiles only    #
+# around the changed cells, updates the Zobrist key with each change and       #
+# undoes the placements from a journal of the changed cells. Each of these is  #
+# compared here with the straightforward way of computing the same result.     #
+#                                                                              #
+################################################################################
+import random
+
+import numpy as np
+import pytest
+
+from engine import Board, Game, History, actions, detect_free_tiles, \
+   merge_tiles, tile_number
+
+
+# A function that returns a board of the given size with random tiles on its
+# lower rows (the exponents are small, so that many tiles can be merged)
+def random_board(rng, grid_h=20, grid_w=12, n_rows=10, density=0.8):
+   board = Board(grid_h, grid_w)
+   for row in range(n_rows):
+      for col in range(grid_w):
+         if rng.random() < density:
+            board.set_tile(row, col, rng.randint(1, 3))
+   return board
+
+
+# A function that merges the tiles as the game originally did: the lowest pair
+# of equal tiles (in row order and then in column order) is merged and the
+# whole grid is scanned again, until there is no pair to merge (returns the
+# merged tile exponents and the score of the merges)
+def merge_by_rescanning(tiles):
+   tiles = tiles.copy()
+   top = tiles.shape[0] - 1  # the tiles on the topmost row are not merged
+   score = 0
+   merged = True
+   while merged:
+      merged = False
+      for row in range(1, top):
+         for col in range(tiles.shape[1]):
+            if tiles[row][col] != 0 and tiles[row][col] == tiles[row - 1][col]:
+               tiles[row - 1][col] += 1
+               score += tile_number(tiles[row - 1][col])
+               # the tiles above the merged pair are shifted down by one cell
+               tiles[row:top - 1, col] = tiles[row + 1:top, col]
+               tiles[top - 1][col] = 0
+               merged = True
+               break
+         if merged:
+            break
+   return tiles, score
+
+
+# A function that returns the set of the (row, col) of the tiles that are not
+# connected to the bottom row, found by a search from all the tiles on it
+def find_free_tiles(tiles):
+   n_rows, n_cols = tiles.shape
+   stack = [(0, col) for col in range(n_cols) if tiles[0][col]]
+   connected = set(stack)
+   while stack:
+      row, col = stack.pop()
+      for r, c in ((row + 1, col), (row - 1, col), (row, col + 1), (row, col - 1)):
+         if 0 <= r < n_rows and 0 <= c < n_cols and tiles[r][c] \
+               and (r, c) not in connected:
+            connected.add((r, c))
+            stack.append((r, c))
+   return {(row, col) for row, col in np.argwhere(tiles).tolist()
+           if (row, col) not in connected}
+
+
+# A function that plays a game with the given seed with random actions until
+# it is over (or for the given number of ticks) and calls the given function
+# after each tick
+def play(game, seed, max_ticks=5000, after_step=None):
+   rng = random.Random(seed)
+   while not game.game_over and game.ticks < max_ticks:
+      if rng.random() < 0.5:
+         game.apply_action(rng.choice(actions))
+      game.step()
+      if after_step is not None:
+         after_step()
+
+
+# A function that returns the state of a game that undo and redo restore
+def get_state(game):
+   grid = game.grid
+   return (grid.tile_matrix.tobytes(), grid.score, grid.game_over,
+           game.pieces_placed, game.lines_cleared, tuple(grid.changed_masks),
+           tuple(grid.row_masks), tuple(grid.column_heights), grid.zobrist_key,
+           game.entry_state, game.next_tetromino.get_state())
+
+
+# Merging each column in a single pass gives the same tiles and score as
+# merging the lowest pair and rescanning the grid after each merge
+@pytest.mark.parametrize("seed", range(50))
+def test_merge_tiles_matches_rescanning(seed):
+   rng = random.Random(seed)
+   board = random_board(rng, n_rows=rng.randint(2, 19))
+   expected_tiles, expected_score = merge_by_rescanning(board.tile_matrix)
+   merge_tiles(board)
+   assert np.array_equal(board.tile_matrix, expected_tiles)
+   assert board.score == expected_score
+   assert board.zobrist_key == board.compute_zobrist_key()
+
+
+# Detecting the free tiles around the changed cells finds the same tiles as a
+# search from the bottom row when the grid had no free tiles before the change
+@pytest.mark.parametrize("seed", range(50))
+def test_detect_free_tiles_matches_full_search(seed):
+   rng = random.Random(seed)
+   board = random_board(rng, density=0.6)
+   # remove the free tiles of the random board, so that only the removals
+   # below can disconnect any tile
+   for row, col in find_free_tiles(board.tile_matrix):
+      board.set_tile(row, col, 0)
+   board.changed_masks = [0] * board.grid_height
+   for _ in range(rng.randint(1, 5)):
+      row, col = rng.randrange(10), rng.randrange(board.grid_width)
+      if board.tile_matrix[row][col]:
+         board.set_tile(row, col, 0)
+         board.mark_changed(row, 1 << col)
+   expected = find_free_tiles(board.tile_matrix)
+   assert set(detect_free_tiles(board)) == expected
+
+
+# The Zobrist key updated with each change is the key computed from all the
+# cells of the grid after every tick of a game
+@pytest.mark.parametrize("seed", range(10))
+def test_zobrist_key_matches_recomputed_key(seed):
+   game = Game(seed=seed)
+
+   def check():
+      assert game.grid.zobrist_key == game.grid.compute_zobrist_key()
+
+   play(game, seed, after_step=check)
+
+
+# Undoing all the placements of a game (including the one that ends it) gives
+# back the state before each of them, and redoing them gives the final state
+@pytest.mark.parametrize("seed", range(10))
+def test_undo_redo_round_trip(seed):
+   game = Game(seed=seed)
+   game.history = History()
+   states = [get_state(game)]
+   n_locks = len(game.history.undo_stack)
+
+   def record():
+      nonlocal n_locks
+      if len(game.history.undo_stack) != n_locks:
+         n_locks = len(game.history.undo_stack)
+         states.append(get_state(game))
+
+   play(game, seed, after_step=record)
+   assert game.game_over
+   final_state = get_state(game)
+   for state in reversed(states[:-1]):
+      assert game.undo()
+      assert get_state(game) == state
+   assert not game.undo()
+   while game.redo():
+      pass
+   assert get_state(game) == final_state
+   assert game.grid.current_tetromino is None
@@ -1,12 +1,8 @@
-import math
-import random
-
 import lib.stddraw as stddraw  # used for drawing the tiles to display them
 from lib.color import Color  # used for coloring the tiles
-import copy as cp # the copy module is used for copying tile positions
 
 
-# Define a list of colors for different tile numbers
+# Define a list of colors for different tile numbers (from 2 up to 4096)
 tile_colors = [
    Color(238, 228, 218),
    Color(236, 224, 202),
@@ -22,8 +18,38 @@ tile_colors = [
    Color(107, 101, 89)
 ]
 
+# the largest exponent of a tile number that has a color in the palette
+max_exponent = 63
+
+
+# A function that computes the palette of the tile colors indexed by the
+# exponent of the tile number as (background color, foreground color) pairs.
+# The numbers greater than 4096 get darker shades of the color for 4096, and
+# a white foreground color so that the numbers stay readable on them.
+def make_palette():
+   black, white = Color(0, 0, 0), Color(255, 255, 255)
+   # the exponent 0 denotes an empty cell, which is not drawn as a tile
+   palette = [(None, None)]
+   palette += [(color, black) for color in tile_colors]
+   darkest = Color(30, 28, 25)
+   last = tile_colors[-1]
+   n_shades = max_exponent + 1 - len(palette)
+   for i in range(1, n_shades + 1):
+      # interpolate from the color for 4096 to the darkest color in 8 steps
+      t = min(i / 8, 1.0)
+      shade = Color(round(last.getRed() + t * (darkest.getRed() - last.getRed())),
+                    round(last.getGreen() + t * (darkest.getGreen() - last.getGreen())),
+                    round(last.getBlue() + t * (darkest.getBlue() - last.getBlue())))
+      palette.append((shade, white))
+   return palette
+
 
-# A class for modeling numbered tiles as in 2048
+# the palette of the tile colors (computed once and shared by all the tiles)
+palette = make_palette()
+
+
+# A class for modeling numbered tiles as in 2048. A tile only stores the
+# exponent of its number and takes its colors from the shared palette.
 class Tile:
    # Class variables shared among all Tile objects
    # ---------------------------------------------------------------------------
@@ -31,36 +57,75 @@ class Tile:
    boundary_thickness = 0.004
    # font family and font size used for displaying the tile number
    font_family, font_size = "Arial", 14
+   # the color of the box (boundary) around the tiles
+   box_color = Color(188, 173, 165)
+
+   # the exponent is the only attribute stored on each tile
+   __slots__ = ('exponent',)
 
-   # A constructor that creates a tile with 2 as the number on it
-   def __init__(self):
-      # set the number on this tile
-      self.number = random.choice([2, 4])
-      # set the colors of this tile
-      # Set the colors of this tile based on the tile number
-      tile_color_index = int(math.log(self.number, 2)) - 1
-      self.background_color = tile_colors[tile_color_index]
-      self.foreground_color = Color(0, 0, 0)  # Black text color
-      self.box_color = Color(188, 173, 165)  # Box (boundary) color
+   # A constructor that creates a tile with the number 2 ** exponent on it
+   def __init__(self, exponent):
+      self.exponent = int(exponent)
 
+   # The number on this tile
+   @property
+   def number(self):
+      return 1 << self.exponent
+
+   # The background color of this tile (based on the tile number)
+   @property
+   def background_color(self):
+      return palette[self.exponent][0]
+
+   # The color of the number on this tile
+   @property
+   def foreground_color(self):
+      return palette[self.exponent][1]
+
+   # the sprites of the drawn tiles keyed by (exponent, length) and the canvas
+   # scale they were rendered at (the sprites are rendered again when the
+   # canvas scale changes)
+   sprites, sprite_scale = {}, None
 
    # A method for drawing this tile at a given position with a given length
+   # (with a single copy of its sprite, which is rendered on the first draw)
    def draw(self, position, length=1):  # length defaults to 1
+      scale = stddraw.canvasScale()
+      if Tile.sprite_scale != scale:
+         Tile.sprites.clear()
+         Tile.sprite_scale = scale
+      key = (self.exponent, length)
+      sprite = Tile.sprites.get(key)
+      if sprite is None:
+         sprite = stddraw.renderSprite(length, length,
+                                       lambda: self.draw_tile(length))
+         Tile.sprites[key] = sprite
+      stddraw.drawSprite(sprite, position.x, position.y)
+
+   # A method for drawing this tile centered at (0, 0) with a given length
+   # (used for rendering the sprites of the tiles)
+   def draw_tile(self, length):
+      background_color, foreground_color = palette[self.exponent]
       # draw the tile as a filled square
-      stddraw.setPenColor(self.background_color)
-      stddraw.filledSquare(position.x, position.y, length / 2)
+      stddraw.setPenColor(background_color)
+      stddraw.filledSquare(0, 0, length / 2)
       # draw the bounding box around the tile as a square
-      stddraw.setPenColor(self.box_color)
+      stddraw.setPenColor(Tile.box_color)
       stddraw.setPenRadius(Tile.boundary_thickness)
-      stddraw.square(position.x, position.y, length / 2)
+      stddraw.square(0, 0, length / 2)
       stddraw.setPenRadius()  # reset the pen radius to its default value
       # draw the number on the tile
-      stddraw.setPenColor(self.foreground_color)
+      stddraw.setPenColor(foreground_color)
       stddraw.setFontFamily(Tile.font_family)
       stddraw.setFontSize(Tile.font_size)
-      stddraw.text(position.x, position.y, str(self.number))
+      stddraw.text(0, 0, str(self.number))
+
+# the tiles are only used for drawing the exponents stored on the game grid,
+# so a single tile is created and shared for each exponent
+_tiles = [Tile(exponent) for exponent in range(max_exponent + 1)]
+
 
-   # Setter method for the position of the tile
-   def set_position(self, position):
-      # set the position of the tile as the given position
-      self.position = cp.copy(position)
\ No newline at end of file
+# A function that returns the tile used for drawing the number with the given
+# exponent (i.e., the number 2 ** exponent)
+def get_tile(exponent):
+   return _tiles[exponent]
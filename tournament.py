@@ -0,0 +1,167 @@
+################################################################################
+#                                                                              #
+# Running tournaments of headless Tetris 2048 games                            #
+#                                                                              #
+# A tournament plays M seeded games with the same policy on a pool of worker   #
+# processes, writes the result of each game to a CSV file as soon as it is     #
+# known and prints the distributions of the results. The seed of each game    #
+# only depends on the tournament seed and the index of the game, so the same  #
+# tournament gives the same results with any number of workers.                #
+#                                                                              #
+# Usage: python tournament.py [-n GAMES] [--seed SEED] [--policy POLICY]       #
+#                             [--workers WORKERS] [--output FILE]              #
+#                                                                              #
+################################################################################
+import argparse  # used for parsing the command line arguments
+import csv  # used for writing the results of the games
+import hashlib  # used for deriving the seeds of the games
+import importlib  # used for loading the policies given as module:function
+import os
+import random
+import statistics  # used for computing the distributions of the results
+import time
+from concurrent.futures import ProcessPoolExecutor  # runs games on all cores
+
+from engine import Game, actions  # the headless game engine
+
+# the columns of the results file
+fields = ["index", "seed", "score", "max_tile", "pieces_placed",
+          "lines_cleared", "ticks", "duration"]
+
+
+# A policy is a function that is called with the game before each gravity tick
+# and returns the action to apply to the current tetromino ("left", "right",
+# "down", "up" or "space") or None to apply no action. A policy can keep state
+# on the game object; its random values should come from the game's seed.
+
+# A policy that drops each tetromino as soon as it enters the grid
+def drop_policy(game):
+   return "space"
+
+
+# A policy that applies uniformly random actions (including no action)
+def random_policy(game):
+   if not hasattr(game, "policy_random"):
+      # a separate generator, so that the actions do not change the tetrominoes
+      # (seeded with a seed derived from the seed of the game, as a generator
+      # with the same seed would repeat the random values of the game)
+      game.policy_random = random.Random(game_seed(game.seed, 1))
+   return game.policy_random.choice(actions + [None])
+
+
+# the policies that can be chosen by name (any other policy can be given as
+# "module:function")
+policies = {"drop": drop_policy, "random": random_policy}
+
+
+# A function that returns the policy with the given name or "module:function"
+def get_policy(name):
+   if name in policies:
+      return policies[name]
+   module_name, _, function_name = name.partition(":")
+   if not function_name:
+      raise ValueError("unknown policy: %s" % name)
+   return getattr(importlib.import_module(module_name), function_name)
+
+
+# A function that derives the seed of the game with the given index in the
+# tournament with the given seed (a 63-bit hash of both values)
+def game_seed(tournament_seed, index):
+   digest = hashlib.blake2b(b"%d:%d" % (tournament_seed, index), digest_size=8)
+   return int.from_bytes(digest.digest(), "little") >> 1
+
+
+# A function that plays a game with the given seed, grid size and policy (for
+# at most max_ticks gravity ticks) and returns its results as a dictionary
+def play_game(index, seed, policy_name, grid_h=20, grid_w=12, max_ticks=100000):
+   policy = get_policy(policy_name)
+   start_time = time.perf_counter()
+   game = Game(grid_h, grid_w, seed=seed)
+   while not game.game_over and game.ticks < max_ticks:
+      action = policy(game)
+      if action is not None:
+         game.apply_action(action)
+      game.step()
+   return {"index": index, "seed": seed, "score": game.score,
+           "max_tile": game.grid.max_tile(),
+           "pieces_placed": game.pieces_placed,
+           "lines_cleared": game.lines_cleared, "ticks": game.ticks,
+           "duration": round(time.perf_counter() - start_time, 6)}
+
+
+# A function that runs a tournament of n_games games on the given number of
+# worker processes (all the cores by default), writes the result of each game
+# to the given CSV file (in the order of the games) and returns the results
+def run_tournament(n_games, seed=0, policy_name="drop", workers=None,
+                   output=None, grid_h=20, grid_w=12, max_ticks=100000):
+   get_policy(policy_name)  # fail early for an unknown policy
+   seeds = [game_seed(seed, index) for index in range(n_games)]
+   workers = workers or os.cpu_count() or 1
+   # the games are sent to the workers in chunks to keep the overhead low
+   chunksize = max(1, n_games // (workers * 8))
+   results = []
+   file = open(output, "w", newline="") if output is not None else None
+   try:
+      writer = csv.DictWriter(file, fields) if file is not None else None
+      if writer is not None:
+         writer.writeheader()
+      with ProcessPoolExecutor(max_workers=workers) as executor:
+         for result in executor.map(play_game, range(n_games), seeds,
+                                    [policy_name] * n_games, [grid_h] * n_games,
+                                    [grid_w] * n_games, [max_ticks] * n_games,
+                                    chunksize=chunksize):
+            results.append(result)
+            if writer is not None:
+               writer.writerow(result)
+               file.flush()
+   finally:
+      if file is not None:
+         file.close()
+   return results
+
+
+# A function that prints the distributions of the results of a tournament
+def print_summary(results, elapsed):
+   print("Games: %d in %.2f s (%.1f games/s)"
+         % (len(results), elapsed, len(results) / max(elapsed, 1e-9)))
+   for field in ["score", "pieces_placed", "lines_cleared", "ticks", "duration"]:
+      values = [result[field] for result in results]
+      if len(values) > 1:
+         # the inclusive method keeps the percentiles within the observed range
+         deciles = statistics.quantiles(values, n=10, method='inclusive')
+         p10, p50, p90 = deciles[0], deciles[4], deciles[8]
+         stdev = statistics.stdev(values)
+      else:
+         p10 = p50 = p90 = values[0]
+         stdev = 0
+      print("%-14s mean %10.6g  std %10.6g  min %10g  p10 %10g  median %10g"
+            "  p90 %10g  max %10g" % (field, statistics.mean(values), stdev,
+                                       min(values), p10, p50, p90, max(values)))
+   # the distribution of the largest tiles reached in the games
+   counts = {}
+   for result in results:
+      counts[result["max_tile"]] = counts.get(result["max_tile"], 0) + 1
+   print("max_tile       " + "  ".join("%d: %.1f%%" % (tile, 100 * count / len(results))
+                                       for tile, count in sorted(counts.items())))
+
+
+if __name__ == '__main__':
+   parser = argparse.ArgumentParser(description="Tetris 2048 tournament")
+   parser.add_argument("-n", "--games", type=int, default=1000,
+                       help="the number of games (default: 1000)")
+   parser.add_argument("--seed", type=int, default=0,
+                       help="the seed of the tournament (default: 0)")
+   parser.add_argument("--policy", default="drop",
+                       help="%s or module:function (default: drop)"
+                            % ", ".join(policies))
+   parser.add_argument("--workers", type=int, default=None,
+                       help="the number of worker processes (default: all cores)")
+   parser.add_argument("--output", metavar="FILE", default=None,
+                       help="write the result of each game to a CSV file")
+   parser.add_argument("--max-ticks", type=int, default=100000,
+                       help="the maximum number of ticks of a game")
+   args = parser.parse_args()
+   start_time = time.perf_counter()
+   results = run_tournament(args.games, args.seed, args.policy, args.workers,
+                            args.output, max_ticks=args.max_ticks)
+   print_summary(results, time.perf_counter() - start_time)
@@ -0,0 +1,293 @@
+################################################################################
+#                                                                              #
+# A batch of headless Tetris 2048 games stepped in lockstep                    #
+#                                                                              #
+# The grids of all the games are stored in one (N, H, W) uint8 array of tile   #
+# exponents and the tetrominoes in parallel arrays, so that the game rules of  #
+# the engine module (moving, gravity, locking, merging, deleting free tiles    #
+# and clearing full rows) are applied to all the games with array operations.  #
+#                                                                              #
+# Stepping 1024 games at once takes about 4 ms, which is only 3 to 4 times     #
+# faster than stepping 1024 engine.Game objects in a loop (15 to 20 ms): the   #
+# engine games are already cheap to step, and the settling of the locked       #
+# grids (about 200 of 1024 per step with random actions) is most of the time.  #
+#                                                                              #
+################################################################################
+import numpy as np  # fundamental Python module for scientific computing
+
+from engine import actions, remove_full_rows, rotation_states, \
+   tetromino_types, tile_exponents
+
+# the action codes (the indexes of the actions in engine.actions) and the code
+# used for applying no action to a game
+LEFT, RIGHT, DOWN, UP, SPACE = range(len(actions))
+NO_ACTION = -1
+# the (dx, dy, rotate) amounts of moving the tetromino for each action code
+# (the hard drop is not a move by a fixed amount, see VectorGame.drop)
+MOVE_X = np.array([-1, 1, 0, 0, 0], dtype=np.int64)
+MOVE_Y = np.array([0, 0, -1, 0, 0], dtype=np.int64)
+MOVE_ROTATE = np.array([0, 0, 0, 1, 0], dtype=np.int64)
+
+# the (dx, dy) offsets of the 4 tiles from the bottom left cell for each type
+# and rotation state (in the order of the tetromino types and rotations) and
+# the size n of the n x n tile matrix of each type
+OFFSET_X = np.array([[[dx for dx, _ in state.offsets] for state in rotation_states[shape]]
+                     for shape in tetromino_types], dtype=np.int64)
+OFFSET_Y = np.array([[[dy for _, dy in state.offsets] for state in rotation_states[shape]]
+                     for shape in tetromino_types], dtype=np.int64)
+MATRIX_SIZE = np.array([rotation_states[shape][0].n for shape in tetromino_types],
+                       dtype=np.int64)
+
+
+# A class for modeling N games of Tetris 2048 that are stepped together
+class VectorGame:
+   # A constructor for creating n_games games with empty grids of the given
+   # size, where all the random values are generated from the given seed
+   def __init__(self, n_games, grid_h=20, grid_w=12, seed=None):
+      self.n_games = n_games
+      self.grid_height, self.grid_width = grid_h, grid_w
+      self.rng = np.random.default_rng(seed)
+      # the tile exponents of the grids (0 denotes an empty cell)
+      self.boards = np.zeros((n_games, grid_h, grid_w), dtype=np.uint8)
+      self.scores = np.zeros(n_games, dtype=np.int64)
+      self.game_over = np.zeros(n_games, dtype=bool)
+      self.ticks = np.zeros(n_games, dtype=np.int64)
+      # whether any tile of a grid was removed or moved since its free tiles
+      # were last deleted (as in engine.delete_free_tiles)
+      self.changed = np.zeros(n_games, dtype=bool)
+      # the current tetrominoes: type index, rotation, position of the bottom
+      # left cell and the exponents of the 4 tiles
+      self.types = np.zeros(n_games, dtype=np.int64)
+      self.rotations = np.zeros(n_games, dtype=np.int64)
+      self.x = np.zeros(n_games, dtype=np.int64)
+      self.y = np.zeros(n_games, dtype=np.int64)
+      self.exponents = np.zeros((n_games, 4), dtype=np.uint8)
+      # the next tetrominoes (they enter the grid with rotation 0)
+      self.next_types = np.zeros(n_games, dtype=np.int64)
+      self.next_x = np.zeros(n_games, dtype=np.int64)
+      self.next_exponents = np.zeros((n_games, 4), dtype=np.uint8)
+      self.reset()
+
+   # A method for restarting the games with the given indexes (all the games
+   # by default) with empty grids and new tetrominoes
+   def reset(self, indexes=None):
+      if indexes is None:
+         indexes = np.arange(self.n_games)
+      indexes = np.asarray(indexes, dtype=np.int64)
+      self.boards[indexes] = 0
+      self.scores[indexes] = 0
+      self.game_over[indexes] = False
+      self.ticks[indexes] = 0
+      self.changed[indexes] = False
+      self.create_next_tetrominoes(indexes)
+      self.spawn(indexes)
+
+   # A method for creating random next tetrominoes for the given games
+   def create_next_tetrominoes(self, indexes):
+      k = len(indexes)
+      types = self.rng.integers(0, len(tetromino_types), size=k)
+      self.next_types[indexes] = types
+      self.next_exponents[indexes] = self.rng.choice(tile_exponents, size=(k, 4))
+      # a random horizontal position where the tile matrix is inside the grid
+      self.next_x[indexes] = self.rng.integers(0, self.grid_width - MATRIX_SIZE[types] + 1)
+
+   # A method that lets the next tetrominoes of the given games enter their
+   # grids and creates new next tetrominoes for them
+   def spawn(self, indexes):
+      self.types[indexes] = self.next_types[indexes]
+      self.rotations[indexes] = 0
+      self.x[indexes] = self.next_x[indexes]
+      self.y[indexes] = self.grid_height - 1
+      self.exponents[indexes] = self.next_exponents[indexes]
+      self.create_next_tetrominoes(indexes)
+
+   # A method that returns the rows and the columns (arrays with the shape
+   # (k, 4)) of the tiles of the current tetrominoes of the given games when
+   # they are placed at the given positions in the given rotation states
+   def get_cells(self, indexes, x, y, rotations):
+      types = self.types[indexes]
+      rows = y[:, None] + OFFSET_Y[types, rotations]
+      cols = x[:, None] + OFFSET_X[types, rotations]
+      return rows, cols
+
+   # A method that checks for each of the given games whether its current
+   # tetromino can be placed at the given position in the given rotation
+   def can_be_placed(self, indexes, x, y, rotations):
+      h, w = self.grid_height, self.grid_width
+      rows, cols = self.get_cells(indexes, x, y, rotations)
+      inside = (cols >= 0) & (cols < w) & (rows >= 0)
+      # the tiles above the grid do not overlap with the locked tiles
+      occupied = self.boards[indexes[:, None], np.clip(rows, 0, h - 1),
+                             np.clip(cols, 0, w - 1)] != 0
+      return (inside & ~(occupied & (rows < h))).all(axis=1)
+
+   # A method that moves or rotates the current tetrominoes of the given games
+   # by the given amounts (numbers or arrays with an amount for each game) if
+   # they can be placed there
+   def try_move(self, indexes, dx=0, dy=0, rotate=0):
+      x, y = self.x[indexes] + dx, self.y[indexes] + dy
+      rotations = (self.rotations[indexes] + rotate) % 4
+      can_move = self.can_be_placed(indexes, x, y, rotations)
+      moved = indexes[can_move]
+      self.x[moved] = x[can_move]
+      self.y[moved] = y[can_move]
+      self.rotations[moved] = rotations[can_move]
+
+   # A method that drops the current tetrominoes of the given games down until
+   # they cannot move anymore, i.e., by the distance of their tiles to the
+   # highest tile or the bottom of the grid below them
+   def drop(self, indexes):
+      h = self.grid_height
+      boards = self.boards[indexes]
+      # the highest occupied row at or below each row of each column (-1 if
+      # there is none)
+      occupied_rows = np.where(boards != 0, np.arange(h, dtype=np.int8)[:, None], -1)
+      highest = np.maximum.accumulate(occupied_rows, axis=1)
+      rows, cols = self.get_cells(indexes, self.x[indexes], self.y[indexes],
+                                  self.rotations[indexes])
+      # the highest occupied row strictly below each tile (-1 for the tiles on
+      # the bottom row)
+      below = highest[np.arange(len(indexes))[:, None],
+                      np.clip(rows - 1, 0, h - 1), cols]
+      below = np.where(rows > 0, below, -1)
+      self.y[indexes] -= (rows - below - 1).min(axis=1)
+
+   # A method that applies the given actions (an array of N action codes, see
+   # engine.actions, where NO_ACTION applies no action) to the current
+   # tetrominoes and then advances all the games by one gravity tick. (This
+   # method returns a boolean array that shows the games whose tetromino is
+   # locked in this step.)
+   def step(self, actions):
+      actions = np.asarray(actions)
+      playing = ~self.game_over
+      # all the moves and the rotations are tried at once
+      moving = playing & (actions != NO_ACTION)
+      dropping = moving & (actions == SPACE)
+      moving &= ~dropping
+      indexes = np.nonzero(moving)[0]
+      if len(indexes):
+         codes = actions[indexes]
+         self.try_move(indexes, MOVE_X[codes], MOVE_Y[codes], MOVE_ROTATE[codes])
+      indexes = np.nonzero(dropping)[0]
+      if len(indexes):
+         self.drop(indexes)
+      # gravity: move the tetrominoes down or lock them on their grids
+      indexes = np.nonzero(playing)[0]
+      self.ticks[indexes] += 1
+      x, y, rotations = self.x[indexes], self.y[indexes] - 1, self.rotations[indexes]
+      can_move = self.can_be_placed(indexes, x, y, rotations)
+      self.y[indexes[can_move]] -= 1
+      locked = np.zeros(self.n_games, dtype=bool)
+      locked[indexes[~can_move]] = True
+      if locked.any():
+         self.lock(np.nonzero(locked)[0])
+      return locked
+
+   # A method that locks the current tetrominoes of the given games on their
+   # grids, settles the grids and spawns the next tetrominoes (the games with
+   # any tile above the topmost grid row are over)
+   def lock(self, indexes):
+      h = self.grid_height
+      rows, cols = self.get_cells(indexes, self.x[indexes], self.y[indexes],
+                                  self.rotations[indexes])
+      inside = rows < h
+      games = np.broadcast_to(indexes[:, None], rows.shape)
+      self.boards[games[inside], rows[inside], cols[inside]] = self.exponents[indexes][inside]
+      over = ~inside.all(axis=1)
+      self.game_over[indexes[over]] = True
+      indexes = indexes[~over]
+      if len(indexes):
+         self.settle(indexes)
+         self.spawn(indexes)
+
+   # A method for settling the grids of the given games: all the merges are
+   # applied, then the free tiles are deleted and the full rows are cleared
+   def settle(self, indexes):
+      boards = self.boards[indexes]
+      scores = np.zeros(len(indexes), dtype=np.int64)
+      merged = merge_tiles(boards, scores)
+      changed = self.changed[indexes] | merged
+      if changed.any():
+         delete_free_tiles(boards, scores, changed)
+      n_cleared, cleared_scores = remove_full_rows(boards)
+      self.boards[indexes] = boards
+      self.scores[indexes] += scores + cleared_scores
+      # the tiles above the cleared rows are moved
+      self.changed[indexes] = n_cleared > 0
+
+   # The largest number on the tiles of each grid (0 for an empty grid)
+   def max_tiles(self):
+      exponents = self.boards.max(axis=(1, 2)).astype(np.int64)
+      return np.where(exponents > 0, np.left_shift(1, exponents), 0)
+
+
+# Function to merge the vertically adjacent tiles with the same number on the
+# given boards in place (as engine.merge_tiles does on a single grid). In each
+# round, the lowest pair of each column of each board is merged, until no
+# column has a pair to merge. The numbers of the merged tiles are added to the
+# given scores and a boolean array that shows the boards with any merge is
+# returned.
+def merge_tiles(boards, scores):
+   n_boards, h, w = boards.shape
+   top = h - 1  # the tiles on the topmost row are neither merged nor shifted
+   merged = np.zeros(n_boards, dtype=bool)
+   rows = np.arange(top)[None, :, None]
+   # the boards that may have a pair to merge
+   indexes = np.arange(n_boards)
+   while len(indexes):
+      tiles = boards[indexes, :top]
+      pairs = (tiles[:, 1:] == tiles[:, :-1]) & (tiles[:, 1:] != 0)
+      has_pair = pairs.any(axis=1)  # (number of boards, w)
+      with_pair = has_pair.any(axis=1)
+      if not with_pair.all():
+         # the boards without any pair are settled
+         indexes, tiles = indexes[with_pair], tiles[with_pair]
+         pairs, has_pair = pairs[with_pair], has_pair[with_pair]
+         if not len(indexes):
+            break
+      merged[indexes] = True
+      # the row of the upper tile of the lowest pair in each column
+      upper = (pairs.argmax(axis=1) + 1)[:, None, :]
+      # the tiles above the merged pair are shifted down by one cell
+      shifted = np.concatenate([tiles[:, 1:], np.zeros((len(indexes), 1, w), np.uint8)], axis=1)
+      result = np.where(rows < upper - 1, tiles,
+                        np.where(rows == upper - 1, tiles + 1, shifted))
+      result = np.where(has_pair[:, None, :], result, tiles)
+      boards[indexes, :top] = result
+      # the merged tiles get the doubled numbers
+      merged_exponents = np.take_along_axis(result, upper - 1, axis=1)[:, 0, :]
+      numbers = np.left_shift(1, merged_exponents.astype(np.int64))
+      scores[indexes] += (numbers * has_pair).sum(axis=1)
+   return merged
+
+
+# Function to delete the tiles that are not connected to the bottom row on the
+# given boards whose tiles were changed (the boolean array changed) in place.
+# The numbers of the deleted tiles are added to the given scores.
+def delete_free_tiles(boards, scores, changed):
+   indexes = np.nonzero(changed)[0]
+   sub_boards = boards[indexes]
+   occupied = sub_boards != 0
+   # the occupied cells of each row as a bitmask (the bit c is the column c)
+   column_bits = np.left_shift(1, np.arange(boards.shape[2], dtype=np.int64))
+   masks = occupied @ column_bits
+   # a flood fill along the occupied cells, which processes all the cells on a
+   # row at once and starts from the tiles that stand on the bottom row in an
+   # unbroken column (so only the tiles held up from the side take more rounds)
+   connected = np.logical_and.accumulate(occupied, axis=1) @ column_bits
+   while True:
+      grown = connected | (connected << 1) | (connected >> 1)
+      grown[:, 1:] |= connected[:, :-1]
+      grown[:, :-1] |= connected[:, 1:]
+      grown &= masks
+      if np.array_equal(grown, connected):
+         break
+      connected = grown
+   free_masks = masks & ~connected
+   if not free_masks.any():
+      return
+   free = (free_masks[:, :, None] & column_bits) != 0
+   numbers = np.left_shift(1, sub_boards.astype(np.int64)) * free
+   scores[indexes] += numbers.sum(axis=(1, 2))
+   sub_boards[free] = 0
+   boards[indexes] = sub_boards